@@ -1,12 +1,86 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from urllib import request
 import urllib.request
 import requests
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+import threading
+import time
 import warnings
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Tuple, Iterable, Iterator
+from contextlib import nullcontext
+import json
+import marshal
+from urllib.parse import urlsplit
 import os
 
+from fields import METRICBEAT_SCHEMAS, FieldExtractor
+from columnar import ParquetLoad
+from checkpoint import Checkpoint, index_name
+from response_cache import ResponseCache, CacheMiss
+from instrumentation import RunStats
+from dedup import Deduplicator
+from trace_index import TRACE_INDEX_SCHEMA, TraceIndex
+from kong import KongRollup
+from sink import RotatingSink
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+# the parts of a _search response the extractor reads; everything else stays on the server
+FILTER_PATH = "hits.total,hits.hits._index,hits.hits._id,hits.hits._source,hits.hits.sort,pit_id,_shards.failed"
+
+# bool.must clauses ANDed with the @timestamp range; the default selects the metricbeat host
+METRICBEAT_QUERY = [
+    {
+        "query_string": {
+            "query": "cee25daa-3fd9-441b-af33-8211e3649f3e",
+            "default_operator": "AND"
+        }
+    }
+]
+
+class ShardFailure(Exception):
+    pass
+
+class PitExpired(Exception):
+    pass
+
+class UncoveredWindow(Exception):
+    pass
+
+def parse_time(value:str)->datetime:
+    return datetime.strptime(value, TIME_FORMAT)
+
+def format_time(value:datetime)->str:
+    return value.isoformat(timespec="milliseconds").replace("+00:00", "")+"Z"
+
+def make_session(pool_size:int=10)->requests.Session:
+    # one keep-alive pool shared by every worker thread
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.verify = False
+    return session
+
+class RateLimiter:
+    def __init__(self, max_rps:float=None):
+        self.interval = 1.0/max_rps if max_rps else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
 class ExtractMetricBeatLogs:
     def __init__(
         self, 
@@ -15,7 +89,24 @@ class ExtractMetricBeatLogs:
         start_time:str="2024-12-14T00:00:00.000Z", 
         end_time:str="2024-12-15T00:00:00.000Z", 
         step:int=500,
-        limit:int=5000
+        limit:int=5000,
+        workers:int=1,
+        max_rps:float=None,
+        session:requests.Session=None,
+        rate_limiter:RateLimiter=None,
+        mode:str="window", # "window" or "search_after"
+        use_pit:bool=True,
+        tiebreaker:str="_id", # sort tiebreaker when use_pit is off
+        min_step:int=1000,
+        max_step:int=900000,
+        retries:int=3,
+        resume:Dict[str, Any]=None, # {"time": ..., "sort": ...} from a previous position
+        cache:ResponseCache=None,
+        stats:RunStats=None,
+        query:List[Dict[str, Any]]=None, # extra bool.must clauses, METRICBEAT_QUERY by default
+        budget:threading.Semaphore=None, # caps in-flight requests shared with other extractors
+        source:List[str]=None, # _source includes, e.g. FieldExtractor.source_includes(); None is the full document
+        filter_path:str=None # e.g. FILTER_PATH
     ):
         warnings.filterwarnings("ignore")
 
@@ -25,39 +116,56 @@ class ExtractMetricBeatLogs:
         self.end_time = end_time
         self.step = step
         self.limit = limit
+        self.workers = max(1, workers)
+        self.session = session or make_session(pool_size=self.workers)
+        self.rate_limiter = rate_limiter or RateLimiter(max_rps)
+        self.mode = mode
+        self.use_pit = use_pit
+        self.tiebreaker = tiebreaker
+        self.min_step = min_step
+        self.max_step = max_step
+        self.retries = retries
+        self.pit_id = None
+        self.resume = resume
+        self.cache = cache
+        self.stats = stats
+        self.query = METRICBEAT_QUERY if query is None else query
+        self.budget = budget
+        self.source = source
+        self.filter_path = filter_path
+        # where a resumed extraction would restart after the last yielded page
+        self.position = resume or {"time": start_time, "sort": None}
     
     @property    
     def __headers(self):
         return {
             "Authorization": f"ApiKey {self.__api_key}",
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip"
         }
         
-    def __data(self, query_time):
+    def __query(self, time_range):
         return {
-            "from": 0,
-            "size": self.limit,
-            "query": {
-                "bool": {
-                    "must": [
-                        {
-                            "query_string": {
-                                "query": "cee25daa-3fd9-441b-af33-8211e3649f3e",
-                                "default_operator": "AND"
-                            }
-                        },
-                        {
-                            "range": {
-                                "@timestamp": {
-                                    "gte": self.start_time,
-                                    "lte": query_time,
-                                    "format": "strict_date_optional_time"
-                                }
+            "bool": {
+                "must": [
+                    *self.query,
+                    {
+                        "range": {
+                            "@timestamp": {
+                                **time_range,
+                                "format": "strict_date_optional_time"
                             }
                         }
-                    ]
-                }
-            },
+                    }
+                ]
+            }
+        }
+
+    def __data(self, gte, lte):
+        data = {
+            "from": 0,
+            "size": self.limit,
+            "query": self.__query({"gte": gte, "lte": lte}),
             "sort": [
                 {
                     "@timestamp": {
@@ -66,199 +174,564 @@ class ExtractMetricBeatLogs:
                 }
             ]
         }
+        if self.source is not None:
+            data["_source"] = {"includes": self.source}
+        return data
+
+    def __page_data(self, gte, lt, search_after=None, pit_id=None):
+        # half-open [gte, lt) so consecutive windows never share a boundary hit
+        data = {
+            "size": self.limit,
+            "query": self.__query({"gte": gte, "lt": lt}),
+            "sort": [
+                {"@timestamp": {"order": "asc"}},
+                {("_shard_doc" if pit_id else self.tiebreaker): {"order": "asc"}}
+            ],
+            "track_total_hits": False
+        }
+        if search_after is not None:
+            data["search_after"] = search_after
+        if pit_id is not None:
+            data["pit"] = {"id": pit_id, "keep_alive": "1m"}
+        if self.source is not None:
+            data["_source"] = {"includes": self.source}
+        return data
+
+    @property
+    def __base(self):
+        # "https://host:port/metricbeat-*/_search" -> ("https://host:port", "metricbeat-*")
+        parts = urlsplit(self.url)
+        index = parts.path.strip("/").split("/")[0]
+        return f"{parts.scheme}://{parts.netloc}", index
+
+    @property
+    def offline(self)->bool:
+        return self.cache is not None and self.cache.offline
+
+    def _record(self, window:Tuple[str, str], data:Dict[str, Any], **kwargs):
+        if self.stats is None or window is None:
+            return
+        hits = data.get("hits", {})
+        total = hits.get("total", {}).get("value")
+        miss_count = self.limit-total if total is not None else None
+        self.stats.request(*window, hits_total=total, hits=len(hits.get("hits", [])), miss_count=miss_count, **kwargs)
+
+    @property
+    def __cache_url(self):
+        # searches are cached under the index url, also when sent to /_search with a pit
+        return f"{self.url}?filter_path={self.filter_path}" if self.filter_path else self.url
+
+    def _send(self, method, url, data=None, window:Tuple[str, str]=None, attempt:int=0):
+        if self.cache is not None and data is not None:
+            cached = self.cache.get(self.__cache_url, data)
+            if cached is not None:
+                cached.pop("pit_id", None)
+                self._record(window, cached, source="cache", retries=attempt)
+                return cached
+            if self.cache.offline:
+                raise CacheMiss(f"{self.url} {window}")
+        self.rate_limiter.wait()
+        with self.budget or nullcontext():
+            started = time.perf_counter()
+            params = {"filter_path": self.filter_path} if self.filter_path and data is not None else None
+            response = self.session.request(method, url, headers=self.__headers, json=data, params=params, timeout=15)
+            latency = time.perf_counter() - started
+        if response.status_code == 404 and data is not None and "pit" in data:
+            # search_context_missing_exception: the pit's keep_alive lapsed, retrying can't help
+            raise PitExpired(data["pit"]["id"])
+        response.raise_for_status()
+        started = time.perf_counter()
+        result = response.json()
+        parsed = time.perf_counter() - started
+        failed = result.get("_shards", {}).get("failed", 0)
+        if failed:
+            # a 200 with failed shards is missing their hits; raised before it is cached, so it is retried
+            raise ShardFailure(f"{failed} shards failed")
+        if self.cache is not None and data is not None:
+            self.cache.put(self.__cache_url, data, response.content, self.cache.is_open(parse_time(window[1])))
+        # raw.tell() counts the bytes read off the socket, before gzip decoding
+        wire = response.raw.tell() if hasattr(response.raw, "tell") else len(response.content)
+        self._record(window, result, latency=latency, size=len(response.content), wire=wire, parse=parsed, retries=attempt)
+        return result
+
+    def _request(self, method, url, data=None, window:Tuple[str, str]=None):
+        for attempt in range(self.retries+1):
+            try:
+                return self._send(method, url, data, window, attempt)
+            except (CacheMiss, PitExpired):
+                raise
+            except Exception as e:
+                print(f"An error occurred: {type(e).__name__} - {e}")
+                if self.stats and window:
+                    # a request's retries are counted once, on its last event
+                    self.stats.request(*window, retries=attempt if attempt == self.retries else 0, error=f"{type(e).__name__} - {e}")
+                if attempt == self.retries:
+                    if self.stats and window:
+                        self.stats.failed_window(*window, f"{type(e).__name__} - {e}")
+                    raise
+                time.sleep(min(2**attempt, 30))
+
+    def open_pit(self)->str:
+        if self.offline:
+            # replayed searches are keyed without the pit id
+            return "offline"
+        base, index = self.__base
+        return self._request("POST", f"{base}/{index}/_pit?keep_alive=1m")["id"]
+
+    def close_pit(self, pit_id:str):
+        if self.offline:
+            return
+        base, _ = self.__base
+        try:
+            self.session.delete(f"{base}/_pit", headers=self.__headers, json={"id": pit_id}, timeout=15)
+        except Exception as e:
+            print(f"An error occurred: {type(e).__name__} - {e}")
     
     def process_response(self, response):
         if response.status_code!=200:
             return False
         else:
-            data = response.json()
-            length = data['hits']["total"]["value"]
-            miss_count = self.limit-length
-            logs = data['hits']["hits"]
-            return logs, length, miss_count
+            return self.process_data(response.json())
+
+    def process_data(self, data):
+        length = data['hits']["total"]["value"]
+        miss_count = self.limit-length
+        # filter_path drops hits.hits altogether when nothing matched
+        logs = data['hits'].get("hits", [])
+        return logs, length, miss_count
         
+    def windows(self)->List[Tuple[str, str]]:
+        start_dt = parse_time(self.resume["time"] if self.resume else self.start_time)
+        end_dt = parse_time(self.end_time)
+        step = timedelta(milliseconds=self.step)
+        windows = []
+        current = start_dt
+        while current < end_dt:
+            window_end = min(current + step, end_dt)
+            windows.append((format_time(current), format_time(window_end)))
+            current = window_end
+        return windows
+
+    def fetch_window(self, window:Tuple[str, str])->List[Dict[str, Any]]:
+        gte, lte = window
+        # retried with backoff; a window that still fails raises rather than coming back
+        # empty, which would let run_etl mark it done
+        log, length, miss_count = self.process_data(self._request("GET", self.url, self.__data(gte, lte), window))
+        if miss_count<0:
+            print(f"Missed {abs(miss_count)} lines from metricbeat-Logging")
+        return log
+
+    @staticmethod
+    def key(hit:Dict[str, Any])->str:
+        return f"{hit.get('_index', '')}/{hit['_id']}"
+
+    def __after(self, hits:List[Dict[str, Any]])->Dict[str, Any]:
+        # the position after a full page: its last sort values and pit, plus the keys of every
+        # hit yielded at the last timestamp so a new pit can restart there without repeats
+        sort = hits[-1]["sort"]
+        seen = [self.key(hit) for hit in hits if hit["sort"][0] == sort[0]]
+        previous = self.position
+        if previous.get("sort") and previous["sort"][0] == sort[0]:
+            seen = list(dict.fromkeys(previous.get("seen", []) + seen))
+        # sort[0] is the last hit's @timestamp in epoch millis
+        last = datetime(1970, 1, 1) + timedelta(milliseconds=sort[0])
+        return {"time": format_time(last), "sort": sort, "pit_id": self.pit_id, "seen": seen}
+
+    def iter_window(self, gte:str, lt:str, search_after:List=None, skip:frozenset=frozenset())->Iterator[List[Dict[str, Any]]]:
+        # follow search_after until a short page, so a dense window never drops hits;
+        # hits whose key is in `skip` were already yielded before a pit was reopened
+        while True:
+            if self.pit_id:
+                base, _ = self.__base
+                data = self._request("GET", f"{base}/_search", self.__page_data(gte, lt, search_after, self.pit_id), (gte, lt))
+                self.pit_id = data.get("pit_id", self.pit_id)
+            else:
+                data = self._request("GET", self.url, self.__page_data(gte, lt, search_after), (gte, lt))
+            hits = data.get("hits", {}).get("hits", [])
+            if len(hits) < self.limit:
+                self.position = {"time": lt, "sort": None}
+            else:
+                self.position = self.__after(hits)
+            yield [hit for hit in hits if self.key(hit) not in skip] if skip else hits
+            if len(hits) < self.limit:
+                return
+            search_after = hits[-1]["sort"]
+
+    def next_step(self, step:int, hits:int)->int:
+        # aim for roughly one full page per window
+        if hits == 0:
+            factor = 2.0
+        else:
+            factor = min(2.0, max(0.25, self.limit/hits))
+        return int(min(self.max_step, max(self.min_step, step*factor)))
+
+    def iter_pages_paged(self)->Iterator[List[Dict[str, Any]]]:
+        start_dt = parse_time(self.resume["time"] if self.resume else self.start_time)
+        end_dt = parse_time(self.end_time)
+        search_after = self.resume["sort"] if self.resume else None
+        skip = frozenset()
+        if search_after and bool(self.resume.get("pit_id")) != self.use_pit:
+            # saved with the other tiebreaker: restart at its timestamp, skipping the hits yielded there
+            search_after, skip = None, frozenset(self.resume.get("seen", ()))
+        step = max(self.min_step, self.step)
+        self.pit_id = None
+        if self.use_pit:
+            # a _shard_doc tiebreaker only means something inside the pit that produced it,
+            # so a resumed run continues in the saved pit while it is still open
+            self.pit_id = (self.resume.get("pit_id") if search_after else None) or self.open_pit()
+        try:
+            with tqdm(total=int((end_dt-start_dt).total_seconds()*1000), desc="Extracting", unit="ms") as bar:
+                current = start_dt
+                while current < end_dt:
+                    window_end = min(current + timedelta(milliseconds=step), end_dt)
+                    gte, lt = format_time(current), format_time(window_end)
+                    hits = 0
+                    pages = self.iter_window(gte, lt, search_after, skip)
+                    while True:
+                        try:
+                            page = next(pages, None)
+                        except PitExpired:
+                            # a new pit restarts at the last yielded timestamp and skips the hits yielded there
+                            restart = self.position if self.position.get("sort") else {"time": gte}
+                            print("Point in time expired, reopening from {}".format(restart["time"]))
+                            self.pit_id = self.open_pit()
+                            pages = self.iter_window(restart["time"], lt, None, frozenset(restart.get("seen", ())))
+                            continue
+                        if page is None:
+                            break
+                        hits += len(page)
+                        yield page
+                    search_after, skip = None, frozenset()
+                    bar.update(int((window_end-current).total_seconds()*1000))
+                    step = self.next_step(step, hits)
+                    current = window_end
+        finally:
+            if self.pit_id:
+                self.close_pit(self.pit_id)
+                self.pit_id = None
+
+    def iter_pages(self)->Iterator[List[Dict[str, Any]]]:
+        if self.mode == "search_after":
+            yield from self.iter_pages_paged()
+        else:
+            windows = self.windows()
+            if self.workers == 1:
+                for window in tqdm(windows, desc="Extracting"):
+                    page = self.fetch_window(window)
+                    self.position = {"time": window[1], "sort": None}
+                    yield page
+            else:
+                # keep at most 2*workers windows in flight and yield them in submission
+                # order: hits stay sorted by @timestamp and a slow consumer stalls the fetchers
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    pending = deque()
+                    for window in tqdm(windows, desc="Extracting"):
+                        pending.append((window, executor.submit(self.fetch_window, window)))
+                        if len(pending) >= 2*self.workers:
+                            done, future = pending.popleft()
+                            page = future.result()
+                            self.position = {"time": done[1], "sort": None}
+                            yield page
+                    while pending:
+                        done, future = pending.popleft()
+                        page = future.result()
+                        self.position = {"time": done[1], "sort": None}
+                        yield page
+        self.start_time = self.end_time
+
+    def iter_log(self)->Iterator[Dict[str, Any]]:
+        for page in self.iter_pages():
+            yield from page
+
     def get_log(self)->List[Dict[str, Any]]:
-        LOGS = []
-        
-        start_dt = datetime.strptime(self.start_time, "%Y-%m-%dT%H:%M:%S.%fZ")
-        end_dt = datetime.strptime(self.end_time, "%Y-%m-%dT%H:%M:%S.%fZ") 
-        delta = end_dt - start_dt
-        milliseconds = int(delta.total_seconds() * 1000)
-        
-        for _ in tqdm(range(0, milliseconds, self.step), desc="Extracting"):
-            current_time = datetime.strptime(self.start_time, "%Y-%m-%dT%H:%M:%S.%fZ") + timedelta(milliseconds=self.step)
-            query_time = current_time.isoformat(timespec="milliseconds").replace("+00:00", "")+"Z"
-            try:
-                response = requests.get(self.url, headers=self.__headers, json=self.__data(query_time), verify=False, timeout=15)
-                if self.process_response(response):
-                    log, length, miss_count = self.process_response(response)
-                    if miss_count<0:
-                        print(f"Missed {abs(miss_count)} lines from metricbeat-Logging")
-                    LOGS+=log
-            except Exception as e:
-                print(f"An error occurred: {type(e).__name__} - {e}")
-            
-            self.start_time = current_time.isoformat(timespec="milliseconds").replace("+00:00", "")+"Z"
-        return LOGS
+        return list(self.iter_log())
+
+    def iter_buckets(self, name:str, composite:Dict[str, Any], aggs:Dict[str, Any])->Iterator[List[Dict[str, Any]]]:
+        # one page of composite buckets over [start_time, end_time) per request, following after_key
+        window = (self.start_time, self.end_time)
+        after = None
+        while True:
+            paged = {**composite, "after": after} if after else composite
+            data = self._request("GET", self.url, {
+                "size": 0,
+                "track_total_hits": False,
+                "query": self.__query({"gte": self.start_time, "lt": self.end_time}),
+                "aggs": {name: {"composite": paged, "aggs": aggs}}
+            }, window)
+            result = data.get("aggregations", {}).get(name, {})
+            buckets = result.get("buckets", [])
+            yield buckets
+            after = result.get("after_key")
+            if not buckets or after is None:
+                return
    
+_worker_extractor = None
+
+def init_transform_worker(extractor:FieldExtractor):
+    # runs once per pool process; the extractor's accessors are compiled there
+    global _worker_extractor
+    _worker_extractor = extractor
+
+def pack_chunk(chunk:List[Any])->Any:
+    # what a pool task carries: hits parsed from JSON marshal about 4x cheaper than they
+    # pickle (about as slow as formatting them), so the parent's share stays small;
+    # raw JSON items already pickle as plain copies
+    if not chunk or isinstance(chunk[0], (bytes, str)):
+        return chunk
+    try:
+        return marshal.dumps(chunk)
+    except ValueError:
+        return chunk
+
+def transform_chunk(chunk:Any)->List[str]:
+    # a pack_chunk() result or a list whose items are hits, or one hit's raw JSON
+    # (bytes/str, e.g. a line of output="json"), parsed here
+    if isinstance(chunk, bytes):
+        chunk = marshal.loads(chunk)
+    line = _worker_extractor.line
+    loads = json.loads
+    lines = (line(loads(item) if isinstance(item, (bytes, str)) else item) for item in chunk)
+    return [text+"\n" for text in lines if text is not None]
+
+def transform_pool(workers:int, extractor:FieldExtractor=None)->ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_transform_worker, initargs=(extractor or FieldExtractor(),))
+
 class Transform():
-    def __init__(self, logs:List=None):
+    def __init__(
+        self,
+        logs:Iterable=None,
+        extractor:FieldExtractor=None,
+        workers:int=1, # >1 formats chunks in a process pool, output order unchanged; logs may then be raw JSON per hit
+        chunk_size:int=2000, # hits per task sent to the pool
+        executor:ProcessPoolExecutor=None # a transform_pool() of `workers` processes shared across Transforms
+    ):
         self.logs = logs
+        self.extractor = extractor or FieldExtractor()
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.executor = executor
+        self.skipped = 0 # hits iter_pages() got no line for
         
     def extract_system_resource_logs(self, entry):
-        # data stream type. 
-        log_source = entry.get("_source", {})
-        timestamp = log_source.get("@timestamp", "N/A")
-        host_name = log_source.get("host", {}).get("name", "N/A") # or host os name
-        metricset = log_source.get("data_stream.type", {})
-        
-        # Extract Metrics 
-        if metricset == "metrics":
-            transaction = log_source.get('transaction', {})
-            
-            system_cpu_usage = log_source.get('system.cpu.usage', None)
-            process_cpu_usage = log_source.get('process.cpu.usage ', None)
-            system_cpu_count = log_source.get('system.cpu.count', None)
-            ## change here *** 
-            jvm_info = log_source.get('process.runtime.jvm', {})
-            jvm_system_cpu_load_1m = jvm_info.get('system.cpu.load_1m', None)
-            jvm_cpu_utilization = jvm_info.get('cpu.utilization', None)
-            jvm_system_cpu_utilization = jvm_info.get('system.cpu.utilization', None)
-
-            # Extracting memory-related information
-            jvm_memory = log_source.get('jvm.memory', {})
-            jvm_memory_committed = jvm_memory.get('committed', None)
-            jvm_memory_max = jvm_memory.get('max', None)
-            jvm_memory_used = jvm_memory.get('used', None)
-
-            jvm_buffer_memory_used = log_source.get('jvm.buffer.memory.used', None)
-            jvm_memory_usage_after_gc = log_source.get('jvm.memory.usage.after.gc', None)
-            jvm_gc_memory_allocated = log_source.get('jvm.gc.memory.allocated', None)
-            jvm_gc_memory_promoted = log_source.get('jvm.gc.memory.promoted', None)
-
-            process_runtime_jvm_memory = jvm_info.get('memory', {})
-            process_runtime_jvm_memory_init = process_runtime_jvm_memory.get('init', None)
-            process_runtime_jvm_memory_limit = process_runtime_jvm_memory.get('limit', None)
-            process_runtime_jvm_memory_usage = process_runtime_jvm_memory.get('usage', None)
-            process_runtime_jvm_memory_committed = process_runtime_jvm_memory.get('committed', None)
-            process_runtime_jvm_memory_usage_after_last_gc = process_runtime_jvm_memory.get('usage_after_last_gc', None)
-
-            # Extracting system memory utilization
-            system_memory_utilization = log_source.get('system.memory.utilization', None)
-            system_memory_usage = log_source.get('system.memory.usage', None)
-
-            # Extracting transaction-related information
-            latency = transaction.get('duration.histogram', {}).get('values', [None])[0]
-            error_rate = transaction.get('result', None)  # Adjust based on actual error rate representation
-            number_of_requests = log_source.get('_doc_count', 0)  # Total document count as number of requests
-            
-            logline = (
-                f"[{timestamp}] | HOST: {host_name} | "
-                f"message: {str(message)}, "
-                f"error_info: {str(error_info)}, "
-                f"error_code: {str(error_code)}, "
-                f"error_cause: {str(error_cause)}"
-            )
-            return logline
+        # dispatches on data_stream.type; field specs live in fields.py
+        return self.extractor.line(entry)
 
+    def iter_chunks(self)->Iterator[List[Any]]:
+        chunk = []
+        for log in self.logs:
+            chunk.append(log)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
 
+    def iter_parallel(self)->Iterator[List[str]]:
+        # at most 2*workers chunks in flight, results yielded in submission order
+        executor = self.executor or transform_pool(self.workers, self.extractor)
+        try:
+            pending = deque()
+            for chunk in self.iter_chunks():
+                pending.append(executor.submit(transform_chunk, pack_chunk(chunk)))
+                if len(pending) >= 2*self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            if not self.executor:
+                executor.shutdown(cancel_futures=True)
 
-        
-        # Extract logs 
-        elif metricset == "logs":
-            timestamp = log_source.get('@timestamp', None)
-            message = log_source.get('message', '')
-            # Extracting error information
-            error_info = log_source.get('error', {})  # Assuming error_info is part of source
-            error_code = error_info.get('exception', [{}])[0].get('type', '')  # Get first exception type
-            error_cause = error_info.get('exception', [{}])[0].get('message', '')  # Get first exception message
-            
-            logline = (
-                f"[{timestamp}] | HOST: {host_name} "
-                f"message: {str(message)}" 
-                f"error_info: {str(error_info)}" 
-                f"error_code: {str(error_code)}"
-                f"error_cause: {str(error_cause)}"
-            )
-            return logline
-        
-        # Extract system load
-        elif metricset == "traces":
-            # Assuming 'source' and 'transaction' are already defined as dictionaries from your JSON data
-
-# Extracting transaction information
-            transaction = log_source.get('transaction', {})
-
-            # Ensure duration is accessed correctly and converted to seconds
-            duration_us = transaction.get('duration', {}).get('us', 0)  # Default to 0 if not found
-
-            # Extracting relevant information into variables
-            timestamp = log_source.get('@timestamp', None)
-            transaction_name = transaction.get('name', '')
-            transaction_duration = duration_us / 1_000_000  # Convert microseconds to seconds
-            transaction_id = transaction.get('id', '')
-            transaction_type = transaction.get('type', '')
-
-            # Extracting span information
-            span = log_source.get('span', {})
-            span_name = span.get('name', '')
-            span_duration = span.get('duration', {}).get('us', 0)  # Duration in microseconds
-            span_subtype = span.get('subtype', '')
-            span_id = span.get('id', '')
-            span_type = span.get('type', '')
-            
-            
-            logline = (
-                f"[{timestamp}] | HOST: {host_name} "
-                f"transaction_name: {str(transaction_name)}" 
-                f"transaction_duration: {str(transaction_duration)}" 
-                f"transaction_id: {str(transaction_id)}"
-                f"transaction_type: {str(transaction_type)}" 
-            
-                f"span_name: {str(span_name)}" 
-                f"span_duration: {str(span_duration)}" 
-                f"span_subtype: {str(span_subtype)}"
-                f"span_type: {str(span_type)}" 
-                f"span_id: {str(span_id)}" 
-            )
-            return logline
-        
-        # Extract Networks
-        # elif metricset == "network":
-        #     network_info = log_source.get("system", {}).get("network", {})
-        #     interface_name = network_info.get("name", "N/A")
-        #     in_bytes = network_info.get("in", {}).get("bytes", 0) / (1024**2) #BYTES
-        #     out_bytes = network_info.get("out", {}).get("bytes", 0) / (1024**2)
-        #     # logline: 
-        #     logline = (
-        #         f"[{timestamp}] ENV: {env} | HOST: {host_name} | NETWORK ({interface_name}): "
-        #         f"IN: {in_bytes:.2f} MB, OUT: {out_bytes:.2f} MB"
-        #     )
-        #     return logline
-        else:
-            return None
+    def iter_pages(self, pages:Iterable[Tuple[List[Any], Any]], barrier:Callable[[], bool]=None)->Iterator[Tuple[List[str], Any]]:
+        # (hits, marker) pages -> (lines, marker) in order. With a pool, chunks stay in flight
+        # across pages, so workers format while the next page is fetched. After a page for
+        # which barrier() is true, everything in flight is drained before another page is read,
+        # and that page's marker comes back last; all other results carry None
+        if not (self.workers > 1 or self.executor):
+            for hits, marker in pages:
+                lines = [line+"\n" for line in map(self.extract_system_resource_logs, hits) if line is not None]
+                self.skipped += len(hits) - len(lines)
+                yield lines, marker
+            return
+        executor = self.executor or transform_pool(self.workers, self.extractor)
+        def result(pending):
+            future, count = pending.popleft()
+            lines = future.result()
+            self.skipped += count - len(lines)
+            return lines
+        try:
+            pending = deque()
+            for hits, marker in pages:
+                for start in range(0, len(hits), self.chunk_size):
+                    chunk = hits[start:start+self.chunk_size]
+                    pending.append((executor.submit(transform_chunk, pack_chunk(chunk)), len(chunk)))
+                    if len(pending) >= 2*self.workers:
+                        yield result(pending), None
+                if barrier and barrier():
+                    while pending:
+                        yield result(pending), None
+                    yield [], marker
+            while pending:
+                yield result(pending), None
+        finally:
+            if not self.executor:
+                executor.shutdown(cancel_futures=True)
+
+    def iter_log(self)->Iterator[str]:
+        if self.workers > 1 or self.executor:
+            for lines in self.iter_parallel():
+                yield from lines
+            return
+        for log in self.logs:
+            line = self.extract_system_resource_logs(log)
+            # documents no schema covers (stderr noise, another stream) are skipped
+            if line is not None:
+                yield line+"\n"
 
-    
     def exact_log(self):
-        LOGS_EXTRACTED = [self.extract_system_resource_logs(log)+"\n" for log in tqdm(self.logs, desc="Transforming")]
+        if self.workers > 1 or self.executor:
+            LOGS_EXTRACTED = []
+            with tqdm(desc="Transforming") as bar:
+                for lines in self.iter_parallel():
+                    LOGS_EXTRACTED.extend(lines)
+                    bar.update(len(lines))
+            return LOGS_EXTRACTED
+        lines = map(self.extract_system_resource_logs, tqdm(self.logs, desc="Transforming"))
+        LOGS_EXTRACTED = [line+"\n" for line in lines if line is not None]
         return LOGS_EXTRACTED         
 
 class Load:
-    def __init__(self, logs:List, log_info:Dict, save_dir:str):
+    def __init__(
+        self,
+        logs:Iterable[str],
+        log_info:Dict,
+        save_dir:str,
+        run:bool=True,
+        compression:str=None, # "gzip" or "zstd": compressed parts plus a time-range index, see sink.py
+        rotate_bytes:int=None, # start a new part after this many uncompressed bytes
+        rotate_lines:int=None, # start a new part after this many lines
+        block_bytes:int=1<<20 # uncompressed bytes per compressed, separately seekable block
+    ):
         self.logs = logs
         self.log_info = log_info
         self.save_dir = save_dir
-        self.run()
+        self.lines = 0
+        self.file = None
+        self.sink = None
+        if compression or rotate_bytes or rotate_lines:
+            self.sink = RotatingSink(self.log_name, compression=compression, rotate_bytes=rotate_bytes, rotate_lines=rotate_lines, block_bytes=block_bytes)
+        if run:
+            self.run()
     
     @property
     def log_name(self):
         return os.path.join(self.save_dir, "metricbeat-logs.{}-{}".format(self.log_info["start_time"], self.log_info["end_time"]))
 
-    def run(self):     
+    @property
+    def partial_name(self):
+        return self.log_name + ".partial"
+
+    @property
+    def output_name(self):
+        # what a finished window points readers at: the file, or the index of its parts
+        return self.sink.index_name if self.sink else self.log_name
+
+    def open(self, offset:int=0):
+        # output goes to <name>.partial until commit(); a resumed window drops
+        # anything written after the last checkpointed offset
+        if self.sink:
+            # compressed blocks can't be truncated to an offset: parts always start over
+            self.sink.open()
+            return
         os.makedirs(os.path.dirname(self.log_name), exist_ok=True)
-        with open(self.log_name, 'w') as f:
-            f.writelines(self.logs)
+        if offset and os.path.exists(self.partial_name):
+            os.truncate(self.partial_name, offset)
+            self.file = open(self.partial_name, 'ab')
+        else:
+            self.file = open(self.partial_name, 'wb')
+
+    def write(self, logs:Iterable[str]):
+        if self.sink:
+            written = self.sink.lines
+            self.sink.write(logs)
+            self.lines += self.sink.lines - written
+            return
+        for line in logs:
+            self.file.write(line.encode())
+            self.lines += 1
+
+    def sync(self)->int:
+        if self.sink:
+            return self.sink.sync()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def commit(self)->int:
+        if self.sink:
+            return self.sink.commit()
+        size = self.sync()
+        self.file.close()
+        os.replace(self.partial_name, self.log_name)
+        return size
+
+    def run(self):     
+        # logs may be a generator: lines are written as they are produced
+        self.open()
+        self.write(self.logs)
+        self.commit()
         
+def record_duplicates(deduplicator:Deduplicator, dropped:Tuple[int, int], stats:RunStats, gte:str, lt:str, save:bool):
+    if not deduplicator:
+        return
+    exact, probable = deduplicator.duplicates - dropped[0], deduplicator.probable - dropped[1]
+    if exact or probable:
+        print("Dropped {} duplicate hits ({} probable)".format(exact + probable, probable))
+    if stats:
+        stats.duplicates(gte, lt, exact, probable)
+    if save:
+        deduplicator.save()
+
+def default_extractor(url:str)->FieldExtractor:
+    # metricbeat documents carry agent.type rather than data_stream.type
+    if index_name(url).startswith("metricbeat"):
+        return FieldExtractor(METRICBEAT_SCHEMAS, stream_path="agent.type")
+    return FieldExtractor()
+
+def record_skipped(skipped:int, written:int, stats:RunStats, gte:str, lt:str):
+    # a window whose hits were all skipped is not marked done: the extractor most likely
+    # does not fit the index, and the window is redone once it is given one that does
+    if not skipped:
+        return
+    print("Skipped {} hits no schema covers".format(skipped))
+    if stats:
+        stats.skipped(gte, lt, skipped)
+    if not written:
+        raise UncoveredWindow("No schema covers any of the {} hits from {} to {}; pass an extractor for this index".format(skipped, gte, lt))
+
+def filtered_pages(extract:ExtractMetricBeatLogs, deduplicator:Deduplicator=None, index:TraceIndex=None, rollup:KongRollup=None, stats:RunStats=None)->Iterator[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+    # each deduplicated page with the extractor position to resume after it; the time spent
+    # getting it is the "extract" stage, whoever pulls the page (the consumer or a Transform)
+    pages = extract.iter_pages()
+    while True:
+        started = time.perf_counter()
+        page = next(pages, None)
+        if page is None:
+            return
+        if deduplicator:
+            page = deduplicator.filter(page)
+        if index is not None:
+            index.extend(page)
+        if rollup:
+            rollup.extend(page)
+        if stats:
+            stats.stage("extract", extract.start_time, extract.end_time, time.perf_counter()-started, len(page))
+        yield page, extract.position
+
+def abandon_window(start_time:str, end_time:str, pool:ProcessPoolExecutor=None):
+    print("Window {} to {} failed and stays unfinished".format(start_time, end_time))
+    if pool:
+        pool.shutdown()
+
 def run_etl(
     url:str="https://116.101.122.180:5200/metricbeat-*/_search",
     api_key:str=None,
@@ -266,17 +739,99 @@ def run_etl(
     end_time:str="2024-12-15T00:00:00.000Z", 
     step:int=2,
     limit:int=5000,
-    cut_off:int=1800 # unit is seconds
+    cut_off:int=1800, # unit is seconds
+    workers:int=1,
+    max_rps:float=None,
+    mode:str="window", # "window" or "search_after"
+    use_pit:bool=True, # search_after mode pages inside a point in time; resumed windows reuse or reopen it
+    output:str="text", # "text", "json" (raw hits, one per line) or "parquet"
+    checkpoint_dir:str=None, # e.g. "./logs/.checkpoints" to skip/resume windows
+    follow:bool=False, # start from the checkpoint high-water mark, end at now - follow_lag
+    follow_lag:int=60, # unit is seconds
+    cache_dir:str=None, # e.g. "./logs/.cache" to keep compressed responses on disk
+    offline:bool=False, # replay from cache_dir only, never touching the cluster
+    stats_path:str=None, # JSON-lines file of per-request/per-stage events
+    prometheus_path:str=None, # Prometheus textfile written at the end of the run
+    query:List[Dict[str, Any]]=None, # bool.must clauses for this index, see ExtractMetricBeatLogs
+    extractor:FieldExtractor=None,
+    save_root:str="./logs",
+    session:requests.Session=None, # shared with other run_etl calls by scheduler.py
+    rate_limiter:RateLimiter=None,
+    budget:threading.Semaphore=None,
+    minimize:bool=True, # request only the _source fields the extractor reads, via filter_path and gzip
+    dedup:bool=True, # drop hits already seen by _index/_id (boundary hits, retries, resumed runs)
+    dedup_recent:int=200000, # keys kept exactly before they move into the Bloom filters
+    dedup_error_rate:float=1e-6, # false-positive bound of the Bloom filters
+    transform_workers:int=1, # >1 formats text output in a process pool
+    transform_chunk_size:int=2000,
+    trace_index:str=None, # e.g. "./logs/traces.index.jsonl.gz": extended with every traces hit, a segment saved with each checkpoint and compacted at the end
+    kong_rollup:str=None, # e.g. "./logs/kong.rollup.json": per route/status rollup of Kong access records, saved with each checkpoint (or at the end without checkpoints)
+    compression:str=None, # "gzip" or "zstd" for text/json output: rotating compressed parts with a time-range index
+    rotate_bytes:int=None, # uncompressed bytes per part
+    rotate_lines:int=None # lines per part
 ):
     
-    start_dt = datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S.%fZ")
-    end_dt = datetime.strptime(end_time, "%Y-%m-%dT%H:%M:%S.%fZ")
+    checkpoint = None
+    if checkpoint_dir:
+        checkpoint = Checkpoint.for_url(url, checkpoint_dir)
+    elif follow:
+        # follow resumes from the high-water mark, so it always keeps checkpoints
+        checkpoint = Checkpoint.for_url(url)
+    if follow:
+        start_time = checkpoint.high_water or start_time
+        end_time = format_time(datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0) - timedelta(seconds=follow_lag))
+    start_dt = parse_time(start_time)
+    end_dt = parse_time(end_time)
+    session = session or make_session(pool_size=max(1, workers))
+    rate_limiter = rate_limiter or RateLimiter(max_rps)
+    extractor = extractor or default_extractor(url)
+    cache = ResponseCache(cache_dir or "./logs/.cache", offline=offline) if cache_dir or offline else None
+    # raw json output keeps whole documents
+    source = extractor.source_includes() if minimize and output != "json" else None
+    if source and trace_index:
+        source = sorted({*source, *TRACE_INDEX_SCHEMA.source_includes()})
+    rollup = KongRollup(kong_rollup) if kong_rollup else None
+    if rollup and checkpoint and not checkpoint.holds(rollup.mark):
+        print("Kong rollup was saved ahead of its checkpoint, going back to the save before")
+        rollup.rewind()
+    if source and rollup:
+        source = sorted({*source, *rollup.extractor.source_includes()})
+    filter_path = FILTER_PATH if minimize else None
+    stats = RunStats(stats_path, prometheus_path, labels={"index": index_name(url)}) if stats_path or prometheus_path else None
+    deduplicator = None
+    if dedup:
+        # with checkpoints the seen keys persist beside them, so resumed and later runs share them;
+        # a fresh checkpoint starts a fresh key set
+        settings = {"recent": dedup_recent, "error_rate": dedup_error_rate}
+        if checkpoint:
+            deduplicator = Deduplicator.for_url(url, os.path.dirname(checkpoint.path), resume=bool(checkpoint.state["windows"]), **settings)
+        else:
+            deduplicator = Deduplicator(**settings)
+    index = TraceIndex(trace_index, evict=True) if trace_index else None
+    pool = transform_pool(transform_workers, extractor) if transform_workers > 1 and output == "text" else None
     current_start = start_dt
     while current_start < end_dt:
         current_end = min(current_start + timedelta(seconds=cut_off), end_dt)
         
-        new_start_time = current_start.isoformat(timespec="milliseconds").replace("+00:00", "")+"Z"
-        new_end_time = current_end.isoformat(timespec="milliseconds").replace("+00:00", "")+"Z"
+        new_start_time = format_time(current_start)
+        recorded_end = checkpoint.recorded_end(new_start_time) if checkpoint else None
+        if recorded_end:
+            # a window recorded with another end (a crashed follow run, a changed end_time)
+            # is finished as it was started, so its partial output and position still apply
+            current_end = parse_time(recorded_end)
+        new_end_time = format_time(current_end)
+        current_start = current_end
+
+        state = checkpoint.window(new_start_time, new_end_time) if checkpoint else {}
+        if state.get("status") == "done":
+            print("Skipping finished window {} to {}".format(new_start_time, new_end_time))
+            continue
+        published = checkpoint.published_lines(state) if checkpoint else None
+        if published is not None:
+            # crashed between publishing the file and recording it; the trace index and
+            # Kong rollup were saved before publishing, so they already hold the whole window
+            checkpoint.done(new_start_time, new_end_time, state["path"], published, os.path.getsize(state["path"]))
+            continue
         
         print("Getting logs from {} to {}".format(new_start_time, new_end_time))
         
@@ -288,13 +843,136 @@ def run_etl(
             "step":step,
             "limit":limit
         }
-        logs = ExtractMetricBeatLogs(
-            **info
-        ).get_log()
-        logs = Transform(logs=logs).exact_log()
-        Load(logs, info, save_dir=f"./logs/{start_time}_{end_time}")
-        
-        current_start = datetime.strptime(new_start_time, "%Y-%m-%dT%H:%M:%S.%fZ") + timedelta(seconds=cut_off)
+        save_dir = f"{save_root}/{start_time}_{end_time}"
+        if output == "parquet":
+            # parquet parts are not appendable: unfinished windows restart from scratch
+            hits = ExtractMetricBeatLogs(**info, workers=workers, mode=mode, use_pit=use_pit, session=session, rate_limiter=rate_limiter, cache=cache, stats=stats, query=query, budget=budget, source=source, filter_path=filter_path).iter_log()
+            dropped = (deduplicator.duplicates, deduplicator.probable) if deduplicator else None
+            if deduplicator:
+                hits = deduplicator.unique(hits)
+            if index is not None:
+                hits = index.tap(hits)
+            if rollup:
+                hits = rollup.tap(hits)
+            started = time.perf_counter()
+            try:
+                parquet = ParquetLoad(hits, info, save_dir=f"{save_dir}/parquet", extractor=extractor)
+                record_skipped(parquet.skipped, parquet.rows_written, stats, new_start_time, new_end_time)
+            except Exception:
+                abandon_window(new_start_time, new_end_time, pool)
+                raise
+            if stats:
+                # extraction runs inside the parquet writer, so this stage includes it
+                stats.stage("load", new_start_time, new_end_time, time.perf_counter()-started, parquet.rows_written)
+            if checkpoint:
+                if index is not None:
+                    # re-adding is idempotent, so a window redone after a crash only replaces its nodes
+                    index.save()
+                if rollup:
+                    # counts are not idempotent: a crash before done rewinds them on the next run
+                    rollup.save(mark={"window": checkpoint.key(new_start_time, new_end_time), "lines": parquet.rows_written})
+                checkpoint.done(new_start_time, new_end_time, f"{save_dir}/parquet", parquet.rows_written, 0)
+            record_duplicates(deduplicator, dropped, stats, new_start_time, new_end_time, save=checkpoint is not None)
+            continue
+
+        # compressed/rotating output restarts unfinished windows, like parquet
+        sinked = bool(compression or rotate_bytes or rotate_lines)
+        resumable = not sinked and state.get("status") == "partial" and os.path.exists(state["path"] + ".partial")
+        if resumable:
+            save_dir = os.path.dirname(state["path"])
+            print("Resuming from {}".format(state["position"]["time"]))
+        extract = ExtractMetricBeatLogs(
+            **info,
+            workers=workers,
+            mode=mode,
+            use_pit=use_pit,
+            session=session,
+            rate_limiter=rate_limiter,
+            cache=cache,
+            stats=stats,
+            query=query,
+            budget=budget,
+            source=source,
+            filter_path=filter_path,
+            resume=state["position"] if resumable else None
+        )
+        load = Load(None, info, save_dir=save_dir, run=False, compression=compression, rotate_bytes=rotate_bytes, rotate_lines=rotate_lines)
+        load.open(state["offset"] if resumable else 0)
+        load.lines = state["lines"] if resumable else 0
+        dropped = (deduplicator.duplicates, deduplicator.probable) if deduplicator else None
+        pages = filtered_pages(extract, deduplicator, index, rollup, stats)
+        transform = None
+        if output == "json":
+            results = (([json.dumps(hit)+"\n" for hit in page], position) for page, position in pages)
+        else:
+            # one Transform per window keeps a pool busy across pages; it drains at checkpoints
+            # so the deduplicator never saves keys of hits that are still in flight
+            barrier = (lambda: checkpoint.due) if checkpoint and not sinked else None
+            transform = Transform(extractor=extractor, workers=transform_workers, chunk_size=transform_chunk_size, executor=pool)
+            results = transform.iter_pages(pages, barrier)
+        try:
+            while True:
+                started = time.perf_counter()
+                fetching = stats.stage_total("extract") if stats else 0.0
+                lines, position = next(results, (None, None))
+                if lines is None:
+                    break
+                transformed = time.perf_counter()
+                load.write(lines)
+                if stats:
+                    # waiting on results also covers fetching the pages behind them, already charged to extract
+                    fetched = stats.stage_total("extract") - fetching
+                    stats.stage("transform", new_start_time, new_end_time, max(0.0, transformed-started-fetched), len(lines))
+                    stats.stage("write", new_start_time, new_end_time, time.perf_counter()-transformed, len(lines))
+                # no partial checkpoint while every hit so far was skipped, so such a window is redone whole
+                uncovered = transform is not None and transform.skipped and not load.lines
+                if position is not None and checkpoint and checkpoint.due and not sinked and not uncovered:
+                    if index is not None:
+                        # the resumed window skips the pages before `position`, so their nodes must be on disk
+                        index.save()
+                    if rollup:
+                        rollup.save(mark={"window": checkpoint.key(new_start_time, new_end_time), "lines": load.lines})
+                    checkpoint.partial(new_start_time, new_end_time, load.log_name, load.sync(), load.lines, position)
+                    if deduplicator:
+                        # saved after the checkpoint: a crash in between can repeat a hit but never lose one
+                        deduplicator.save()
+            if transform is not None:
+                record_skipped(transform.skipped, load.lines, stats, new_start_time, new_end_time)
+        except Exception:
+            # neither committed nor marked done: high_water stays before this window
+            # and the next run resumes it from its last partial checkpoint
+            abandon_window(new_start_time, new_end_time, pool)
+            raise
+        if checkpoint:
+            # saved before the file is published, so the recovery branch above can trust them
+            if index is not None:
+                index.save()
+            if rollup:
+                rollup.save(mark={"window": checkpoint.key(new_start_time, new_end_time), "lines": load.lines})
+        started = time.perf_counter()
+        size = load.commit()
+        if stats:
+            stats.stage("write", new_start_time, new_end_time, time.perf_counter()-started)
+        if checkpoint:
+            checkpoint.done(new_start_time, new_end_time, load.output_name, load.lines, size)
+        record_duplicates(deduplicator, dropped, stats, new_start_time, new_end_time, save=checkpoint is not None)
+    if pool:
+        pool.shutdown()
+    if index is not None:
+        index.close()
+        print("Trace index: {} traces, {} transactions/spans".format(index.trace_count, len(index)))
+    if rollup:
+        if not checkpoint:
+            rollup.save()
+        print("Kong rollup: {} service/route/status cells, {} non-access lines skipped".format(len(rollup.cells), rollup.skipped))
+    if cache:
+        print("Response cache: {} hits, {} misses".format(cache.hits, cache.misses))
+    if stats:
+        summary = stats.close()
+        print("Run stats: {} requests, {} hits, {} missed, {} skipped, {} failed windows, latency p50 {} p99 {}".format(
+            summary["requests"], summary["hits"], summary["missed"], summary["skipped"], summary["failed_windows"],
+            summary["latency_s"]["p50"], summary["latency_s"]["p99"]
+        ))
         
     
 if __name__ == "__main__":
@@ -303,15 +981,18 @@ if __name__ == "__main__":
         ["2024-12-23T00:00:00.000Z","2024-12-24T00:00:00.000Z"],
         ["2024-12-24T00:00:00.000Z","2024-12-25T00:00:00.000Z"]
     ]
-    for time in time_collect:
+    for window in time_collect:
         run_etl(
             url="https://116.101.122.180:5200/metricbeat-*/_search",
             api_key='',
-            start_time=time[0], 
-            end_time=time[1], 
+            start_time=window[0], 
+            end_time=window[1], 
             step=1000, # unit is mili seconds
             limit=6000,
-            cut_off=900 # unit is seconds
+            cut_off=900, # unit is seconds
+            workers=16,
+            max_rps=200,
+            checkpoint_dir="./logs/.checkpoints"
         )
         
 # scp -r '/Users/longcaca/Downloads/example' 'aiteam@aiteam:/home/aiteam/Documents/longvu02/'    
@@ -0,0 +1,120 @@
+# Benchmark: compiled field accessors (fields.py) vs the per-hit dict walking
+# Transform and get_metrics.py used before. Run from the repo root:
+#   python benchmarks/bench_fields.py [repeat]
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fields import SCHEMAS, FieldExtractor
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "logs")
+
+def load_hits(name):
+    with open(os.path.join(LOG_DIR, name), "r") as file:
+        return json.load(file)["hits"]["hits"]
+
+# previous hand-written extraction, kept here only as the baseline
+def legacy_metrics_row(hit):
+    source = hit['_source']
+    transaction = source.get('transaction', {})
+    return {
+        'Timestamp': source.get('@timestamp', None),
+        'System CPU Usage': source.get('system.cpu.usage', None),
+        'Process CPU Usage': source.get('process.cpu.usage', None),
+        'System CPU Count': source.get('system.cpu.count', None),
+        'jvm_system_cpu_load_1m': source.get('process.runtime.jvm.system.cpu.load_1m', None),
+        'jvm_cpu_utilization': source.get('process.runtime.jvm.cpu.utilization', None),
+        'jvm_system_cpu_utilization': source.get('process.runtime.jvm.system.cpu.utilization', None),
+        'jvm.memory.committed': source.get('jvm.memory.committed', None),
+        'jvm.memory.max': source.get('jvm.memory.max', None),
+        'jvm.memory.used': source.get('jvm.memory.used', None),
+        'jvm.buffer.memory.used': source.get('jvm.buffer.memory.used', None),
+        'jvm.memory.usage.after.gc': source.get('jvm.memory.usage.after.gc', None),
+        'jvm.gc.memory.allocated': source.get('jvm.gc.memory.allocated', None),
+        'jvm.gc.memory.promoted': source.get('jvm.gc.memory.promoted', None),
+        'process.runtime.jvm.memory.init': source.get('process.runtime.jvm.memory.init', None),
+        'process.runtime.jvm.memory.limit': source.get('process.runtime.jvm.memory.limit', None),
+        'process.runtime.jvm.memory.usage': source.get('process.runtime.jvm.memory.usage', None),
+        'process.runtime.jvm.memory.committed': source.get('process.runtime.jvm.memory.committed', None),
+        'process.runtime.jvm.memory.usage_after_last_gc': source.get('process.runtime.jvm.memory.usage_after_last_gc', None),
+        'system.memory.utilization': source.get('system.memory.utilization', None),
+        'system.memory.usage': source.get('system.memory.usage', None),
+        'Latency': transaction.get('duration.histogram', {}).get('values', [None])[0],
+        'Error Rate': transaction.get('result', None),
+        'Number of Requests': source.get('_doc_count', 0)
+    }
+
+def legacy_traces_line(entry):
+    log_source = entry.get("_source", {})
+    host_name = log_source.get("host", {}).get("name", "N/A")
+    transaction = log_source.get('transaction', {})
+    duration_us = transaction.get('duration', {}).get('us', 0)
+    span = log_source.get('span', {})
+    return (
+        f"[{log_source.get('@timestamp', None)}] | HOST: {host_name} "
+        f"transaction_name: {str(transaction.get('name', ''))}"
+        f"transaction_duration: {str(duration_us / 1_000_000)}"
+        f"transaction_id: {str(transaction.get('id', ''))}"
+        f"transaction_type: {str(transaction.get('type', ''))}"
+        f"span_name: {str(span.get('name', ''))}"
+        f"span_duration: {str(span.get('duration', {}).get('us', 0))}"
+        f"span_subtype: {str(span.get('subtype', ''))}"
+        f"span_type: {str(span.get('type', ''))}"
+        f"span_id: {str(span.get('id', ''))}"
+    )
+
+def legacy_logs_line(entry):
+    log_source = entry.get("_source", {})
+    host_name = log_source.get("host", {}).get("name", "N/A")
+    error_info = log_source.get('error', {})
+    return (
+        f"[{log_source.get('@timestamp', None)}] | HOST: {host_name} "
+        f"message: {str(log_source.get('message', ''))}"
+        f"error_info: {str(error_info)}"
+        f"error_code: {str(error_info.get('exception', [{}])[0].get('type', ''))}"
+        f"error_cause: {str(error_info.get('exception', [{}])[0].get('message', ''))}"
+    )
+
+def legacy_dispatch(legacy, stream):
+    # Transform picked the formatter from data_stream.type before calling it
+    def line(entry):
+        if entry.get("_source", {}).get("data_stream.type", {}) == stream:
+            return legacy(entry)
+    return line
+
+def measure(run, hits, repeat):
+    # best of `repeat` passes over the hits, docs/s
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(hits)
+        best = min(best, time.perf_counter() - start)
+    return len(hits) / best
+
+def main(repeat=200):
+    line = FieldExtractor().line
+    row = SCHEMAS["metrics"].row
+    # both sides are called the way get_metrics.py and Transform call them; the
+    # compiled metrics row also reads the Host column get_metrics.py never had
+    cases = [
+        ("metrics rows", load_hits("metrics-apm.json"), legacy_metrics_row, lambda hits: [row(hit["_source"]) for hit in hits]),
+        ("traces lines", load_hits("traces-apm.json"), legacy_dispatch(legacy_traces_line, "traces"), lambda hits: [line(hit) for hit in hits]),
+        ("logs lines", load_hits("logs-apm-v2.json"), legacy_dispatch(legacy_logs_line, "logs"), lambda hits: [line(hit) for hit in hits]),
+    ]
+    results = []
+    for name, hits, legacy, compiled in cases:
+        # interleaved, so both sides see the same machine noise
+        legacy_rate = compiled_rate = 0
+        for _ in range(repeat // 10 or 1):
+            legacy_rate = max(legacy_rate, measure(lambda hits: [legacy(hit) for hit in hits], hits, 10))
+            compiled_rate = max(compiled_rate, measure(compiled, hits, 10))
+        results.append({"case": name, "docs": len(hits), "legacy_docs_per_s": round(legacy_rate), "compiled_docs_per_s": round(compiled_rate)})
+        print(f"{name:14s} legacy {legacy_rate:>12,.0f} docs/s | compiled {compiled_rate:>12,.0f} docs/s | x{compiled_rate/legacy_rate:.2f}")
+    return results
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,59 @@
+# Benchmark: json_stream.iter_hits vs json.load on Elasticsearch dumps.
+# The shipped dumps are replicated into a larger pretty-printed response so the
+# memory difference is visible. Run from the repo root:
+#   python benchmarks/bench_json_stream.py [copies]
+
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from json_stream import iter_hits
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "logs")
+
+def make_dump(path, copies):
+    with open(os.path.join(LOG_DIR, "metrics-apm.json"), "r") as file:
+        data = json.load(file)
+    data["hits"]["hits"] = data["hits"]["hits"] * copies
+    with open(path, "w") as file:
+        json.dump(data, file, indent=4)
+
+def run_json_load(path):
+    with open(path, "r") as file:
+        data = json.load(file)
+    return sum(1 for _ in data["hits"]["hits"])
+
+def run_iter_hits(path):
+    return sum(1 for _ in iter_hits(path))
+
+def measure(fn, path):
+    # timed without tracemalloc (it slows allocation-heavy code), then traced once for peak memory
+    start = time.perf_counter()
+    docs = fn(path)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return docs, elapsed, peak
+
+def main(copies=20):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dump.json")
+        make_dump(path, copies)
+        size = os.path.getsize(path)
+        print(f"dump: {size/2**20:.1f} MiB")
+        results = []
+        for name, fn in (("json.load", run_json_load), ("iter_hits", run_iter_hits)):
+            docs, elapsed, peak = measure(fn, path)
+            results.append({"reader": name, "docs": docs, "docs_per_s": round(docs/elapsed), "mib_per_s": round(size/2**20/elapsed, 1), "peak_mib": round(peak/2**20, 1)})
+            print(f"{name:10s} {docs} docs {docs/elapsed:>10,.0f} docs/s {size/2**20/elapsed:>7.1f} MiB/s peak {peak/2**20:>8.1f} MiB")
+        return results
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,76 @@
+# Benchmark: the metrics DataFrame built from one dict per hit (get_metrics.py) vs
+# the typed MetricsTable column buffers, both streaming the same NDJSON dump with
+# json_stream.iter_hits, plus the per-host resample / rolling / rate features.
+# Each case runs in a fresh interpreter so peak RSS is its own. Run from the repo root:
+#   python benchmarks/bench_metrics_table.py [docs]
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_pipeline import peak_rss_mb
+
+CASES = ["dict_rows", "typed_columns", "features"]
+
+def run_case(case:str, path:str)->dict:
+    import pandas as pd
+    from fields import SCHEMAS, FieldExtractor
+    from json_stream import iter_hits
+    from metrics_table import MetricsTable, features
+
+    start = time.perf_counter()
+    if case == "dict_rows":
+        frame = pd.DataFrame(FieldExtractor().rows(iter_hits(path), "metrics"), columns=SCHEMAS["metrics"].columns)
+    else:
+        frame = MetricsTable.from_hits(iter_hits(path)).frame()
+    seconds = time.perf_counter() - start
+    result = {
+        "case": case,
+        "docs": len(frame),
+        "build_s": round(seconds, 3),
+        "docs_per_s": round(len(frame) / seconds, 1),
+        "frame_mib": round(frame.memory_usage(deep=True).sum() / 2**20, 2),
+        "dtypes": sorted({str(dtype) for dtype in frame.dtypes}),
+    }
+    if case == "features":
+        start = time.perf_counter()
+        tables = features(frame)
+        result["features_s"] = round(time.perf_counter() - start, 3)
+        result["rows"] = {freq: len(table) for freq, table in tables.items()}
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def main(count=200000):
+    from synthetic import generate
+
+    with tempfile.NamedTemporaryFile("w", suffix=".ndjson", delete=False) as file:
+        for hit in generate(count, streams=["metrics"], docs_per_second=20):
+            file.write(json.dumps(hit) + "\n")
+    results = []
+    try:
+        for case in CASES:
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", case, file.name], capture_output=True, text=True)
+            if process.returncode != 0:
+                print(f"{case} failed:\n{process.stderr[-2000:]}", file=sys.stderr)
+                continue
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            extra = f"  features {result['features_s']:.3f} s {result['rows']}" if "features_s" in result else ""
+            print(f"{case:14s} {result['docs']:>8d} docs  {result['build_s']:7.3f} s  {result['docs_per_s']:>10,.0f} docs/s  "
+                  f"frame {result['frame_mib']:7.2f} MiB  peak {result['peak_rss_mb']} MB{extra}", file=sys.stderr)
+            results.append(result)
+    finally:
+        os.remove(file.name)
+    return results
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--case"]:
+        print(json.dumps(run_case(sys.argv[2], sys.argv[3])))
+    else:
+        print(json.dumps(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)))
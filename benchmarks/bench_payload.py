@@ -0,0 +1,68 @@
+# Benchmark: full _source responses vs _source includes + filter_path, both over
+# gzip, against the fake Elasticsearch. Reports wire bytes, decoded bytes, JSON
+# decode time and docs/s from RunStats, and checks Transform output is unchanged.
+# Run from the repo root:
+#   python benchmarks/bench_payload.py [docs]
+
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, BENCH_DIR)
+
+from contextlib import redirect_stdout
+
+from ETL_MetricBeat import FILTER_PATH, ExtractMetricBeatLogs, Transform
+from fake_es import FakeElasticsearch
+from fields import FieldExtractor
+from instrumentation import RunStats
+from synthetic import generate
+
+START_TIME = "2024-12-23T00:00:00.000Z"
+
+def run(server, end_time, minimize):
+    extractor = FieldExtractor()
+    stats = RunStats()
+    extract = ExtractMetricBeatLogs(
+        url=server.url(), api_key="", start_time=START_TIME, end_time=end_time, step=10000, limit=1000, workers=4,
+        stats=stats, source=extractor.source_includes() if minimize else None, filter_path=FILTER_PATH if minimize else None
+    )
+    start = time.perf_counter()
+    with redirect_stdout(sys.stderr):
+        hits = extract.get_log()
+    seconds = time.perf_counter() - start
+    lines = list(Transform(logs=hits, extractor=extractor).iter_log())
+    summary = stats.summary()
+    return lines, {
+        "case": "minimized" if minimize else "full",
+        "docs": len(hits),
+        "requests": summary["requests"],
+        "wire_bytes": summary["wire_bytes"],
+        "decoded_bytes": summary["response_bytes"],
+        "decode_s": summary["stage_seconds"]["parse"],
+        "docs_per_s": round(len(hits) / seconds, 1),
+    }
+
+def main(count=20000):
+    hits = list(generate(count, docs_per_second=100))
+    end_time = hits[-1]["_source"]["@timestamp"][:19] + ".999Z"
+    with FakeElasticsearch(hits) as server:
+        # warm the server's filtered-source cache so both cases pay the same serving cost
+        run(server, end_time, True)
+        full_lines, full = run(server, end_time, False)
+        min_lines, minimized = run(server, end_time, True)
+    for result in (full, minimized):
+        print(
+            f"{result['case']:10s} {result['docs']:>7d} docs  wire {result['wire_bytes']/2**20:8.2f} MiB  "
+            f"decoded {result['decoded_bytes']/2**20:8.2f} MiB  decode {result['decode_s']:6.3f} s  {result['docs_per_s']:>10,.0f} docs/s"
+        )
+    print(f"wire x{full['wire_bytes']/minimized['wire_bytes']:.1f} smaller, decode x{full['decode_s']/max(minimized['decode_s'], 1e-9):.1f} faster, "
+          f"Transform output identical: {full_lines == min_lines}")
+    return [full, minimized]
+
+if __name__ == "__main__":
+    results = main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
+    print(json.dumps(results))
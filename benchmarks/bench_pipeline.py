@@ -0,0 +1,191 @@
+# End-to-end benchmark of Extract, Transform and Load against a local fake
+# Elasticsearch (fake_es.py) serving synthetic hits (synthetic.py).
+# Each scenario/size pair runs in a fresh interpreter so peak RSS is its own.
+# Results are written as JSON; pass an earlier result file to --compare to see
+# docs/s ratios against another commit. Run from the repo root:
+#   python benchmarks/bench_pipeline.py --sizes 2000,20000 --out bench.json
+#   python benchmarks/bench_pipeline.py --compare bench.json
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+START_TIME = "2024-12-23T00:00:00.000Z"
+SCENARIOS = ["extract", "extract_paged", "transform", "load", "run_etl"]
+
+def peak_rss_mb()->float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024*1024 if sys.platform == "darwin" else 1024), 1)
+
+def dir_bytes(path:str)->int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+def end_time(last_millis:int)->str:
+    from synthetic import format_time
+    from datetime import datetime, timedelta
+    last = datetime(1970, 1, 1) + timedelta(milliseconds=last_millis)
+    return format_time(last.replace(microsecond=0) + timedelta(seconds=1))
+
+def run_scenario(args)->dict:
+    from synthetic import generate
+    from fake_es import FakeElasticsearch
+    from ETL_MetricBeat import ExtractMetricBeatLogs, Transform, Load, run_etl
+
+    hits = generate(
+        args.size, streams=args.streams.split(","), start_time=START_TIME, docs_per_second=args.density,
+        burst_every=args.burst_every, burst_size=args.burst_size
+    )
+    workdir = tempfile.mkdtemp(prefix="bench-etl-")
+    server = None
+    lines = None
+    if args.scenario in ("extract", "extract_paged", "run_etl"):
+        # the server keeps hits serialized, so they are never all alive as dicts
+        server = FakeElasticsearch(hits, latency=args.latency, max_result_window=args.max_result_window).start()
+        end = end_time(server.millis[-1])
+    else:
+        hits = list(hits)
+        end = end_time(hits[-1]["sort"][0])
+        if args.scenario == "load":
+            lines = Transform(logs=hits).exact_log()
+            hits = None
+    info = {"start_time": START_TIME, "end_time": end}
+    baseline = peak_rss_mb()
+
+    docs = 0
+    # keep stdout for the JSON result; the pipeline prints progress there
+    with redirect_stdout(sys.stderr):
+        start = time.perf_counter()
+        if args.scenario in ("extract", "extract_paged"):
+            extract = ExtractMetricBeatLogs(
+                url=server.url(), api_key="", start_time=START_TIME, end_time=end, step=args.step, limit=args.limit,
+                workers=args.workers, mode="search_after" if args.scenario == "extract_paged" else "window"
+            )
+            docs = len(extract.get_log())
+        elif args.scenario == "transform":
+            docs = len(Transform(logs=hits).exact_log())
+        elif args.scenario == "load":
+            docs = len(lines)
+            Load(lines, info, save_dir=workdir)
+        elif args.scenario == "run_etl":
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                run_etl(
+                    url=server.url(), api_key="", start_time=START_TIME, end_time=end, step=args.step, limit=args.limit,
+                    cut_off=args.cut_off, workers=args.workers, mode=args.mode
+                )
+            finally:
+                os.chdir(cwd)
+            for root, _, files in os.walk(workdir):
+                for name in files:
+                    with open(os.path.join(root, name), "rb") as file:
+                        docs += sum(1 for _ in file)
+        seconds = time.perf_counter() - start
+
+    result = {
+        "scenario": args.scenario,
+        "size": args.size,
+        "docs": docs,
+        "seconds": round(seconds, 4),
+        "docs_per_s": round(docs / seconds, 1) if seconds else None,
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": peak_rss_mb(),
+        "bytes_written": dir_bytes(workdir),
+    }
+    shutil.rmtree(workdir, ignore_errors=True)
+    if server:
+        stats = server.stats()
+        result.update({
+            "requests": stats["requests"],
+            "requests_per_s": round(stats["requests"] / seconds, 1) if seconds else None,
+            "bytes_received": stats["bytes_sent"],
+        })
+        server.stop()
+    return result
+
+def git_commit()->str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def compare(old_path:str, results:list):
+    with open(old_path, "r") as file:
+        old = {(r["scenario"], r["size"]): r for r in json.load(file)["results"]}
+    for result in results:
+        before = old.get((result["scenario"], result["size"]))
+        if before and before["docs_per_s"] and result["docs_per_s"]:
+            print(
+                f"{result['scenario']:14s} {result['size']:>8d} docs  {before['docs_per_s']:>10,.0f} -> {result['docs_per_s']:>10,.0f} docs/s"
+                f"  x{result['docs_per_s']/before['docs_per_s']:.2f}  rss {before['peak_rss_mb']} -> {result['peak_rss_mb']} MB"
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Extract, Transform and Load against a fake Elasticsearch")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--sizes", default="2000,20000")
+    parser.add_argument("--streams", default="metrics,logs,traces", help="synthetic streams, from metricbeat,metrics,logs,traces,kong")
+    parser.add_argument("--density", type=float, default=100.0, help="hits per second of event time")
+    parser.add_argument("--burst-every", type=int, default=0, help="every Nth second gets --burst-size extra hits")
+    parser.add_argument("--burst-size", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the fake server waits per request")
+    parser.add_argument("--max-result-window", type=int, default=10000)
+    parser.add_argument("--step", type=int, default=5000, help="extract window in milliseconds")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--cut-off", type=int, default=600)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--mode", default="window")
+    parser.add_argument("--out", default=None, help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--scenario", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(json.dumps(run_scenario(args)))
+        return
+
+    results = []
+    for size in [int(size) for size in args.sizes.split(",")]:
+        for scenario in args.scenarios.split(","):
+            command = [sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--scenario", scenario, "--size", str(size)]
+            process = subprocess.run(command, capture_output=True, text=True)
+            if process.returncode != 0:
+                print(f"{scenario} {size} failed:\n{process.stderr[-2000:]}", file=sys.stderr)
+                continue
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            print(f"{scenario:14s} {size:>8d} docs  {result['docs_per_s']:>10,.0f} docs/s  peak {result['peak_rss_mb']} MB", file=sys.stderr)
+            results.append(result)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {key: value for key, value in vars(args).items() if key not in ("scenario", "size", "out", "compare")},
+        "results": results,
+    }
+    if args.compare:
+        compare(args.compare, results)
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(report, file, indent=1)
+    else:
+        print(json.dumps(report, indent=1))
+
+if __name__ == "__main__":
+    main()
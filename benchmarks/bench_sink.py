@@ -0,0 +1,80 @@
+# Benchmark: Load's plain text file vs RotatingSink parts (gzip, and zstd when
+# installed). Reports write throughput, bytes on disk, and the time to pull a short
+# time range back out: a full scan of the plain file vs read_range() seeking to the
+# indexed blocks. Run from the repo root:
+#   python benchmarks/bench_sink.py [--docs 200000] [--rotate-lines 100000] [--range-seconds 60]
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, BENCH_DIR)
+
+from contextlib import redirect_stderr
+from datetime import datetime, timedelta
+
+from ETL_MetricBeat import Load, Transform
+from fields import FieldExtractor
+from sink import line_timestamp, read_range, zstandard
+from synthetic import format_time, generate
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def scan(path, start_time, end_time):
+    with open(path, "r") as f:
+        return [line for line in f if start_time <= line_timestamp(line) <= end_time]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compressed, rotating output")
+    parser.add_argument("--docs", type=int, default=200000)
+    parser.add_argument("--rotate-lines", type=int, default=100000)
+    parser.add_argument("--block-bytes", type=int, default=1<<20)
+    parser.add_argument("--range-seconds", type=int, default=60)
+    args = parser.parse_args()
+
+    hits = list(generate(args.docs))
+    with open(os.devnull, "w") as devnull, redirect_stderr(devnull):
+        lines = Transform(logs=hits, extractor=FieldExtractor()).exact_log()
+    info = {"start_time": hits[0]["_source"]["@timestamp"], "end_time": hits[-1]["_source"]["@timestamp"]}
+    middle = len(hits) // 2
+    start_time = hits[middle]["_source"]["@timestamp"]
+    end_time = format_time(datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S.%fZ") + timedelta(seconds=args.range_seconds))
+    raw_bytes = sum(len(line.encode()) for line in lines)
+    cases = [("plain", {}), ("gzip", {"compression": "gzip"})]
+    if zstandard is not None:
+        cases.append(("zstd", {"compression": "zstd"}))
+    root = tempfile.mkdtemp(prefix="bench-sink-")
+    results = []
+    try:
+        expected = None
+        for name, options in cases:
+            save_dir = os.path.join(root, name)
+            load, seconds = timed(lambda: Load(lines, info, save_dir=save_dir, rotate_lines=args.rotate_lines if options else None, block_bytes=args.block_bytes, **options))
+            size = sum(os.path.getsize(os.path.join(save_dir, file)) for file in os.listdir(save_dir))
+            if options:
+                found, read_seconds = timed(lambda: list(read_range(load.output_name, start_time, end_time)))
+            else:
+                found, read_seconds = timed(lambda: scan(load.output_name, start_time, end_time))
+                expected = found
+            assert found == expected, f"{name} range read differs from the plain scan"
+            results.append({
+                "case": name, "write_s": round(seconds, 3), "write_mib_s": round(raw_bytes / 2**20 / seconds, 1),
+                "bytes": size, "ratio": round(raw_bytes / size, 2), "range_lines": len(found), "range_s": round(read_seconds, 4),
+            })
+            print(f"{name:6s} write {seconds:7.3f} s ({raw_bytes/2**20/seconds:7.1f} MiB/s)  {size/2**20:8.2f} MiB on disk (x{raw_bytes/size:.1f})  "
+                  f"{len(found)} lines in range in {read_seconds*1000:8.1f} ms")
+    finally:
+        shutil.rmtree(root)
+    print(json.dumps({"docs": args.docs, "raw_bytes": raw_bytes, "range": [start_time, end_time], "results": results}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Benchmark: Transform.exact_log on one core vs the process-pool mode, fed either
+# hit dicts (marshalled to the workers by pack_chunk) or each hit's raw JSON bytes
+# (workers parse them). Reports docs/s, speedup over one core, and the parent-side
+# cost of serializing the chunks sent to the pool, pickled as is or packed first. Run from the repo root:
+#   python benchmarks/bench_transform.py [--docs 200000] [--workers 2,4,8] [--chunk-size 2000]
+
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, BENCH_DIR)
+
+from contextlib import redirect_stderr
+
+from ETL_MetricBeat import Transform, init_transform_worker, pack_chunk, transform_chunk, transform_pool
+from fields import FieldExtractor
+from synthetic import generate
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def chunks(items, size):
+    return [items[i:i+size] for i in range(0, len(items), size)]
+
+def pickling(items, size, pack=lambda chunk: chunk):
+    # what the parent pays to ship every chunk to a worker
+    start = time.perf_counter()
+    sent = sum(len(pickle.dumps(pack(chunk), protocol=pickle.HIGHEST_PROTOCOL)) for chunk in chunks(items, size))
+    return sent, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parallel Transform")
+    parser.add_argument("--docs", type=int, default=200000)
+    parser.add_argument("--streams", default="metrics,logs,traces")
+    parser.add_argument("--workers", default=",".join(str(n) for n in (2, 4, 8) if n <= max(2, os.cpu_count() or 1)))
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    hits = list(generate(args.docs, streams=args.streams.split(",")))
+    raw = [json.dumps(hit).encode() for hit in hits] # as read from an output="json" file
+    extractor = FieldExtractor()
+    results = []
+    with open(os.devnull, "w") as devnull, redirect_stderr(devnull):
+        expected, seconds = timed(lambda: Transform(logs=hits, extractor=extractor).exact_log())
+        results.append({"case": "serial", "input": "dicts", "workers": 1, "seconds": seconds})
+        # the worker function in this process: parse + format on one core
+        init_transform_worker(extractor)
+        _, seconds = timed(lambda: transform_chunk(raw))
+        results.append({"case": "serial", "input": "raw", "workers": 1, "seconds": seconds})
+        for workers in [int(n) for n in args.workers.split(",")]:
+            pool = transform_pool(workers, extractor)
+            # start the processes outside the timing
+            list(pool.map(transform_chunk, [[]] * workers))
+            for name, items in (("dicts", hits), ("raw", raw)):
+                lines, seconds = timed(lambda: Transform(logs=items, workers=workers, chunk_size=args.chunk_size, executor=pool).exact_log())
+                assert lines == expected, f"{name} output differs with {workers} workers"
+                results.append({"case": "pool", "input": name, "workers": workers, "seconds": seconds})
+            pool.shutdown()
+    serial = {result["input"]: result["seconds"] for result in results if result["case"] == "serial"}
+    for result in results:
+        result["docs_per_s"] = round(args.docs / result["seconds"], 1)
+        result["speedup"] = round(serial["dicts"] / result["seconds"], 2)
+        result["seconds"] = round(result["seconds"], 3)
+        print(f"{result['case']:7s} {result['input']:6s} {result['workers']:>3d} workers  {result['seconds']:8.3f} s  "
+              f"{result['docs_per_s']:>10,.0f} docs/s  x{result['speedup']:.2f}")
+    for case, name, items, pack in (("pickle", "dicts", hits, None), ("pack", "dicts", hits, pack_chunk), ("pack", "raw", raw, pack_chunk)):
+        sent, seconds = pickling(items, args.chunk_size, *([pack] if pack else []))
+        results.append({"case": case, "input": name, "bytes": sent, "seconds": round(seconds, 3)})
+        print(f"{case:7s} {name:6s} {sent/2**20:8.2f} MiB in {seconds:6.3f} s ({seconds/args.docs*1e6:.2f} us/doc in the parent)")
+    print(json.dumps({"cpus": os.cpu_count(), "docs": args.docs, "chunk_size": args.chunk_size, "results": results}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+# Local stand-in for the Elasticsearch endpoints ExtractMetricBeatLogs uses:
+# _search with an @timestamp range, from/size, search_after and point-in-time,
+# plus opening/closing a pit (searching a closed or unknown pit is a 404, like an expired one). Hits are kept pre-serialized and sorted by
+# (@timestamp, _id) so a request costs a bisect and a join. _source includes,
+# filter_path and gzip responses (Accept-Encoding) are honoured the way
+# Elasticsearch applies them, and a composite aggregation (terms/date_histogram
+# sources with avg/max/min/sum/value_count/percentiles) is computed exactly.
+# Latency and max_result_window are configurable; other query clauses are ignored.
+
+import bisect
+import gzip
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+INTERVALS = {"ms": 1, "s": 1000, "m": 60_000, "h": 3_600_000, "d": 86_400_000}
+
+def _millis(value:str)->int:
+    dt = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+def _range(query:Dict[str, Any])->Dict[str, Any]:
+    if "range" in query:
+        return query["range"]["@timestamp"]
+    clauses = query.get("bool", {})
+    for clause in clauses.get("must", []) + clauses.get("filter", []):
+        found = _range(clause)
+        if found:
+            return found
+    return {}
+
+def _filter(node:Any, paths:List[str], prefix:str="")->Any:
+    # keeps dotted paths (matched through arrays and flattened keys), like _source includes and filter_path
+    if isinstance(node, list):
+        items = [_filter(item, paths, prefix) for item in node if isinstance(item, (dict, list))]
+        return [item for item in items if item]
+    kept = {}
+    for key, value in node.items():
+        path = prefix + key
+        if any(path == include or path.startswith(include + ".") for include in paths):
+            kept[key] = value
+        elif isinstance(value, (dict, list)) and any(include.startswith(path + ".") for include in paths):
+            value = _filter(value, paths, path + ".")
+            if value:
+                kept[key] = value
+    return kept
+
+def _field(node:Any, path:str)->Any:
+    # an aggregation field the way Elasticsearch maps it: each dot may be a nested
+    # object or part of a flattened key; None when absent
+    if path in node:
+        return node[path]
+    for i, char in enumerate(path):
+        if char == "." and isinstance(node.get(path[:i]), dict):
+            value = _field(node[path[:i]], path[i+1:])
+            if value is not None:
+                return value
+    return None
+
+def _values(value:Any)->List[Tuple[float, int]]:
+    # (value, weight) pairs; histogram fields count each value `counts` times
+    if isinstance(value, dict) and "values" in value:
+        return list(zip(value["values"], value.get("counts", [1]*len(value["values"]))))
+    if isinstance(value, list):
+        return [(item, 1) for item in value if isinstance(item, (int, float))]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return [(value, 1)]
+    return []
+
+def _metric(kind:str, spec:Dict[str, Any], pairs:List[Tuple[float, int]])->Dict[str, Any]:
+    weight = sum(count for _, count in pairs)
+    if kind == "value_count":
+        return {"value": weight}
+    if kind == "sum":
+        return {"value": sum(value*count for value, count in pairs)}
+    if kind == "avg":
+        return {"value": sum(value*count for value, count in pairs)/weight if weight else None}
+    if kind in ("max", "min"):
+        return {"value": (max if kind == "max" else min)(value for value, _ in pairs) if pairs else None}
+    if kind == "percentiles":
+        ordered = sorted(pairs)
+        results = []
+        for percent in spec.get("percents", [1, 5, 25, 50, 75, 95, 99]):
+            value = None
+            if weight:
+                rank, seen = percent / 100 * weight, 0
+                for value, count in ordered:
+                    seen += count
+                    if seen >= rank:
+                        break
+            results.append({"key": float(percent), "value": value})
+        if spec.get("keyed", True):
+            return {"values": {str(item["key"]): item["value"] for item in results}}
+        return {"values": results}
+    raise ValueError(f"unsupported aggregation {kind}")
+
+class FakeElasticsearch:
+    def __init__(self, hits:Iterable[Dict[str, Any]], latency:float=0.0, max_result_window:int=10000, total_hits_cap:int=10000, port:int=0):
+        docs = []
+        for hit in hits:
+            hit = dict(hit)
+            sort = hit.pop("sort", None) or [_millis(hit["_source"]["@timestamp"])]
+            docs.append((sort[0], hit["_id"], json.dumps(hit).encode()))
+        docs.sort(key=lambda doc: doc[:2])
+        self.keys = [doc[:2] for doc in docs]
+        self.millis = [doc[0] for doc in docs]
+        self.bodies = [doc[2] for doc in docs]
+        self._sources = {} # _source includes -> {position: source-filtered hit}
+        self.latency = latency
+        self.max_result_window = max_result_window
+        self.total_hits_cap = total_hits_cap
+        self.requests = 0
+        self.bytes_sent = 0
+        self.hits_sent = 0
+        self.pits = set() # open point-in-time ids
+        self._pit_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self)->int:
+        return self._server.server_address[1]
+
+    def url(self, index:str="metricbeat-*")->str:
+        return f"http://127.0.0.1:{self.port}/{index}/_search"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self)->Dict[str, int]:
+        return {"requests": self.requests, "bytes_sent": self.bytes_sent, "hits_sent": self.hits_sent}
+
+    def _hit(self, i:int, includes:Tuple[str, ...])->Dict[str, Any]:
+        if includes is None:
+            return json.loads(self.bodies[i])
+        cache = self._sources.setdefault(includes, {})
+        if i not in cache:
+            hit = json.loads(self.bodies[i])
+            hit["_source"] = _filter(hit["_source"], list(includes))
+            cache[i] = hit
+        return dict(cache[i])
+
+    def aggregate(self, lo:int, hi:int, aggs:Dict[str, Any])->Dict[str, Any]:
+        name, spec = next(iter(aggs.items()))
+        composite = spec["composite"]
+        sources = [next(iter(source.items())) for source in composite["sources"]]
+        groups = {}
+        for i in range(lo, hi):
+            document = json.loads(self.bodies[i])["_source"]
+            key = []
+            for _, source in sources:
+                if "terms" in source:
+                    value = _field(document, source["terms"]["field"])
+                else:
+                    histogram = source["date_histogram"]
+                    interval = histogram.get("fixed_interval") or histogram.get("calendar_interval")
+                    unit = interval.lstrip("0123456789")
+                    interval = int(interval[:-len(unit)] or 1) * INTERVALS[unit]
+                    value = self.millis[i] - self.millis[i] % interval
+                if value is None:
+                    break
+                key.append(value)
+            else:
+                groups.setdefault(tuple(key), []).append(document)
+        keys = sorted(groups)
+        after = composite.get("after")
+        if after:
+            after = tuple(after[source_name] for source_name, _ in sources)
+            keys = keys[bisect.bisect_right(keys, after):]
+        buckets = []
+        for key in keys[:composite.get("size", 10)]:
+            documents = groups[key]
+            bucket = {"key": {source_name: value for (source_name, _), value in zip(sources, key)}}
+            bucket["doc_count"] = sum(document.get("_doc_count", 1) for document in documents)
+            for sub_name, sub in spec.get("aggs", {}).items():
+                kind, params = next(iter(sub.items()))
+                pairs = [pair for document in documents for pair in _values(_field(document, params["field"]))]
+                bucket[sub_name] = _metric(kind, params, pairs)
+            buckets.append(bucket)
+        result = {"buckets": buckets}
+        if buckets:
+            result["after_key"] = buckets[-1]["key"]
+        return {name: result}
+
+    def open_pit(self)->str:
+        with self._lock:
+            self._pit_count += 1
+            pit_id = f"fake-pit-{self._pit_count}"
+            self.pits.add(pit_id)
+        return pit_id
+
+    def search(self, body:Dict[str, Any], filter_path:List[str]=None)->Tuple[int, bytes]:
+        if "pit" in body and body["pit"]["id"] not in self.pits:
+            error = {"type": "search_context_missing_exception", "reason": f"No search context found for id [{body['pit']['id']}]"}
+            return 404, json.dumps({"error": {"root_cause": [error], **error}, "status": 404}).encode()
+        size = body.get("size", 10)
+        offset = body.get("from", 0)
+        if offset + size > self.max_result_window:
+            error = {"type": "illegal_argument_exception", "reason": f"Result window is too large, from + size must be less than or equal to: [{self.max_result_window}]"}
+            return 400, json.dumps({"error": {"root_cause": [error], **error}, "status": 400}).encode()
+        bounds = _range(body.get("query", {}))
+        lo = bisect.bisect_left(self.millis, _millis(bounds["gte"])) if "gte" in bounds else 0
+        if "gt" in bounds:
+            lo = bisect.bisect_right(self.millis, _millis(bounds["gt"]))
+        hi = bisect.bisect_right(self.millis, _millis(bounds["lte"])) if "lte" in bounds else len(self.millis)
+        if "lt" in bounds:
+            hi = bisect.bisect_left(self.millis, _millis(bounds["lt"]))
+        total = max(0, hi - lo)
+        matched = lo
+        tiebreaker = None
+        for spec in body.get("sort", [])[1:2]:
+            tiebreaker = next(iter(spec))
+        search_after = body.get("search_after")
+        if search_after:
+            if tiebreaker == "_shard_doc":
+                start = search_after[1] + 1
+            elif tiebreaker:
+                start = bisect.bisect_right(self.keys, tuple(search_after[:2]))
+            else:
+                start = bisect.bisect_right(self.millis, search_after[0])
+            lo = max(lo, start)
+        lo += offset
+        end = min(hi, lo + size)
+        sorts = []
+        for i in range(lo, end):
+            sort = [self.millis[i]]
+            if tiebreaker == "_shard_doc":
+                sort.append(i)
+            elif tiebreaker:
+                sort.append(self.keys[i][1])
+            sorts.append(sort)
+        response = {"took": 1, "timed_out": False, "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0}}
+        if "pit" in body:
+            response["pit_id"] = body["pit"]["id"]
+        if body.get("track_total_hits", True) is not False:
+            capped = total > self.total_hits_cap
+            response["hits"] = {"total": {"value": min(total, self.total_hits_cap), "relation": "gte" if capped else "eq"}, "max_score": None}
+        else:
+            response["hits"] = {"max_score": None}
+        if "aggs" in body or "aggregations" in body:
+            response["aggregations"] = self.aggregate(matched, hi, body.get("aggs") or body["aggregations"])
+        with self._lock:
+            self.hits_sent += max(0, end - lo)
+        source = body.get("_source")
+        if source is not None or filter_path or "aggregations" in response:
+            includes = source.get("includes") if isinstance(source, dict) else source
+            includes = tuple(includes) if isinstance(includes, list) else None
+            response["hits"]["hits"] = [{**self._hit(i, includes), "sort": sort} for i, sort in zip(range(lo, end), sorts)]
+            if filter_path:
+                response = _filter(response, filter_path)
+            return 200, json.dumps(response).encode()
+        # "hits" is serialized last so the pre-encoded documents can be spliced in
+        head = json.dumps(response).encode()[:-2]
+        parts = [self.bodies[i][:-1] + b', "sort": ' + json.dumps(sort).encode() + b"}" for i, sort in zip(range(lo, end), sorts)]
+        return 200, head + b', "hits": [' + b", ".join(parts) + b"]}}"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status:int, body:bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                    # level 3 is Elasticsearch's default http.compression_level
+                    body = gzip.compress(body, compresslevel=3)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with fake._lock:
+                    fake.requests += 1
+                    fake.bytes_sent += len(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if self.path.split("?")[0].endswith("/_pit"):
+                    self._reply(200, json.dumps({"id": fake.open_pit()}).encode())
+                elif self.path.split("?")[0].endswith("/_search"):
+                    filter_path = parse_qs(urlsplit(self.path).query).get("filter_path")
+                    self._reply(*fake.search(body, filter_path[0].split(",") if filter_path else None))
+                else:
+                    self._reply(404, b'{"error": "not found", "status": 404}')
+
+            do_GET = do_POST
+
+            def do_DELETE(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                pit_id = json.loads(self.rfile.read(length) or b"{}").get("id")
+                with fake._lock:
+                    freed = int(pit_id in fake.pits)
+                    fake.pits.discard(pit_id)
+                self._reply(200, json.dumps({"succeeded": True, "num_freed": freed}).encode())
+
+        return Handler
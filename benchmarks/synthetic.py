@@ -0,0 +1,111 @@
+# Synthetic Elasticsearch hits for the benchmarks, modeled on the dumps in logs/*.json.
+# Every generated hit is a copy of a real document from the matching dump with a
+# new @timestamp, _id, sort key and host, jittered float metrics and, for APM
+# traces and Kong access logs, fresh ids, durations, statuses and routes.
+
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "logs")
+
+DUMPS = {
+    "metricbeat": "metricbeat-.json",
+    "metrics": "metrics-apm.json",
+    "logs": "logs-apm-v2.json",
+    "traces": "traces-apm.json",
+    "kong": "kong-access-.json",
+}
+
+HOSTS = ["ivaapp14", "ivaapp15", "ivaapp16", "ivaapp17"]
+KONG_ROUTES = ["/api/users/no-auth/tv", "/api/content/home", "/api/playback/start", "/api/search", "/api/epg/channels"]
+KONG_STATUS = [("200", 90), ("201", 2), ("304", 3), ("400", 2), ("404", 2), ("499", 0.5), ("502", 0.5)]
+
+def load_templates(stream:str, limit:int=50)->List[str]:
+    with open(os.path.join(LOG_DIR, DUMPS[stream]), "r") as file:
+        hits = json.load(file)["hits"]["hits"]
+    if stream == "kong":
+        # only parsed access lines, not the controller's stderr noise
+        hits = [hit for hit in hits if "status" in hit["_source"]]
+    # one hit per distinct document shape first (dumps are sorted, so shapes cluster), then the rest in order
+    shapes, varied, rest = set(), [], []
+    for hit in hits:
+        shape = frozenset(hit["_source"])
+        (rest if shape in shapes else varied).append(hit)
+        shapes.add(shape)
+    return [json.dumps(hit) for hit in (varied + rest)[:limit]]
+
+def format_time(value:datetime)->str:
+    return value.isoformat(timespec="milliseconds").replace("+00:00", "")+"Z"
+
+def _jitter(node:Any, rng:random.Random):
+    for key, value in node.items():
+        if isinstance(value, float):
+            node[key] = round(value * rng.uniform(0.5, 1.5), 4)
+        elif isinstance(value, dict):
+            _jitter(value, rng)
+
+def _traces(source:Dict[str, Any], rng:random.Random):
+    source.setdefault("trace", {})["id"] = "%032x" % rng.getrandbits(128)
+    for event in ("transaction", "span"):
+        if event in source:
+            source[event]["id"] = "%016x" % rng.getrandbits(64)
+            source[event].setdefault("duration", {})["us"] = int(rng.lognormvariate(8, 1.5))
+
+def _kong(source:Dict[str, Any], rng:random.Random, timestamp:datetime):
+    status = rng.choices([status for status, _ in KONG_STATUS], [weight for _, weight in KONG_STATUS])[0]
+    path = f"{rng.choice(KONG_ROUTES)}?id={rng.getrandbits(32):08x}"
+    size = int(rng.lognormvariate(6, 2))
+    time_local = timestamp.strftime("%d/%b/%Y:%H:%M:%S +0000")
+    request_id = "%032x" % rng.getrandbits(128)
+    source.update({
+        "status": status, "path": path, "body_bytes_sent": size, "time_local": time_local, "kong_request_id": request_id,
+    })
+    source["message"] = (
+        f'{source["remote_address"]} - - [{time_local}] "{source["http_method"]} {path} {source["header"]}" '
+        f'{status} {size} "-" "{source["http_user_agent"]}" kong_request_id: "{request_id}"'
+    )
+    source.setdefault("event", {})["original"] = source["message"]
+
+def generate(
+    count:int,
+    streams:List[str]=("metrics", "logs", "traces"),
+    start_time:str="2024-12-23T00:00:00.000Z",
+    docs_per_second:float=100.0, # hit density
+    burst_every:int=0, # every Nth second also gets `burst_size` extra hits (oversized windows)
+    burst_size:int=0,
+    hosts:List[str]=HOSTS,
+    seed:int=0
+)->Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    templates = {stream: load_templates(stream) for stream in streams}
+    start = datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    offset_ms = 0.0
+    step_ms = 1000.0 / docs_per_second
+    second = -1
+    burst = 0
+    for i in range(count):
+        if burst:
+            burst -= 1
+        else:
+            offset_ms += step_ms
+            if burst_every and int(offset_ms // 1000) != second:
+                second = int(offset_ms // 1000)
+                burst = burst_size if second % burst_every == 0 else 0
+        stream = streams[i % len(streams)]
+        hit = json.loads(rng.choice(templates[stream]))
+        source = hit["_source"]
+        timestamp = start + timedelta(milliseconds=int(offset_ms))
+        source["@timestamp"] = format_time(timestamp)
+        source.setdefault("host", {})["name"] = hosts[i % len(hosts)]
+        _jitter(source, rng)
+        if stream == "traces":
+            _traces(source, rng)
+        elif stream == "kong":
+            _kong(source, rng, timestamp)
+        hit["_id"] = "doc%012d" % i
+        hit["sort"] = [int((timestamp - epoch).total_seconds() * 1000)]
+        yield hit
@@ -0,0 +1,99 @@
+# Durable per-index extraction checkpoints for run_etl.
+# One JSON file per index records every cut_off window as "partial" (with the
+# byte offset of the output written so far and the extractor position to resume
+# from) or "done" (the completion marker for its Load output).
+
+import json
+import os
+import re
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+def index_name(url:str)->str:
+    # "https://host:5200/metricbeat-*/_search" -> "metricbeat-"
+    index = urlsplit(url).path.strip("/").split("/")[0]
+    return re.sub(r"[^A-Za-z0-9_.-]", "", index) or "default"
+
+def atomic_write(path:str, data:str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class Checkpoint:
+    def __init__(self, path:str, interval:float=5.0):
+        self.path = path
+        self.interval = interval # min seconds between partial saves
+        self._saved_at = 0.0
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.state = json.load(f)
+        else:
+            self.state = {"high_water": None, "windows": {}}
+
+    @classmethod
+    def for_url(cls, url:str, checkpoint_dir:str="./logs/.checkpoints", **kwargs):
+        return cls(os.path.join(checkpoint_dir, f"{index_name(url)}.json"), **kwargs)
+
+    @staticmethod
+    def key(start_time:str, end_time:str)->str:
+        return f"{start_time}_{end_time}"
+
+    @property
+    def high_water(self)->Optional[str]:
+        return self.state["high_water"]
+
+    def window(self, start_time:str, end_time:str)->Dict[str, Any]:
+        return self.state["windows"].get(self.key(start_time, end_time), {})
+
+    def recorded_end(self, start_time:str)->Optional[str]:
+        # the end a window starting at start_time was recorded with, preferring an
+        # unfinished one; follow mode moves the last window's end between runs
+        prefix = f"{start_time}_"
+        ends = {key[len(prefix):]: state["status"] for key, state in self.state["windows"].items() if key.startswith(prefix)}
+        return next((end for end, status in ends.items() if status == "partial"), next(iter(ends), None))
+
+    @staticmethod
+    def published_lines(state:Dict[str, Any])->Optional[int]:
+        # lines of a partial window whose file was published before it could be marked done
+        if state.get("status") != "partial" or not os.path.exists(state["path"]) or os.path.exists(state["path"] + ".partial"):
+            return None
+        with open(state["path"], "rb") as f:
+            return sum(1 for _ in f)
+
+    def holds(self, mark:Optional[Dict[str, Any]])->bool:
+        # whether state saved with `mark` ({"window": key, "lines": written}) is what this checkpoint recorded
+        if mark is None:
+            return True
+        state = self.state["windows"].get(mark["window"], {})
+        return state.get("lines") == mark["lines"] or self.published_lines(state) == mark["lines"]
+
+    def is_done(self, start_time:str, end_time:str)->bool:
+        return self.window(start_time, end_time).get("status") == "done"
+
+    def save(self):
+        atomic_write(self.path, json.dumps(self.state, indent=1, sort_keys=True))
+        self._saved_at = time.monotonic()
+
+    @property
+    def due(self)->bool:
+        return time.monotonic() - self._saved_at >= self.interval
+
+    def partial(self, start_time:str, end_time:str, path:str, offset:int, lines:int, position:Dict[str, Any]):
+        # the caller must have fsync'ed <path>.partial up to `offset` before recording it
+        self.state["windows"][self.key(start_time, end_time)] = {
+            "status": "partial", "path": path, "offset": offset, "lines": lines, "position": position
+        }
+        self.save()
+
+    def done(self, start_time:str, end_time:str, path:str, lines:int, size:int):
+        self.state["windows"][self.key(start_time, end_time)] = {
+            "status": "done", "path": path, "lines": lines, "bytes": size
+        }
+        if self.high_water is None or end_time > self.high_water:
+            self.state["high_water"] = end_time
+        self.save()
@@ -0,0 +1,212 @@
+# Columnar Parquet sink for the logs, metrics and traces records defined in fields.py.
+# Files are laid out as hive partitions so readers can prune by stream and hour:
+#   <root>/stream=<data_stream.type>/date=YYYY-MM-DD/hour=HH/part-<start>-<end>.parquet
+# Each part is written as a hidden .<part>.parquet.partial and renamed only on a clean close.
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fields import FieldExtractor, Schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError: # optional dependency, only needed for output="parquet"
+    pa = ds = pq = None
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("columnar output needs pyarrow: pip install pyarrow")
+
+def arrow_type(dtype:str):
+    _require_pyarrow()
+    return {
+        "string": pa.string(),
+        "json": pa.string(),
+        "float64": pa.float64(),
+        "int64": pa.int64(),
+        "timestamp": pa.timestamp("ms", tz="UTC"),
+    }[dtype]
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MILLISECOND = timedelta(milliseconds=1)
+
+def epoch_millis(value:Any)->Optional[int]:
+    # "2025-01-02T13:04:05.123456+07:00" -> UTC epoch millis, for any precision or offset;
+    # naive times are taken as UTC and numbers as epoch millis already
+    if value is None or value.__class__ is bool:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return (parsed - EPOCH) // MILLISECOND
+
+def arrow_schema(schema:Schema):
+    return pa.schema([(field.name, arrow_type(field.dtype)) for field in schema.fields])
+
+def _column(values:List[Any], dtype:str):
+    if dtype == "timestamp":
+        # ParquetSink.write has already turned these into UTC epoch millis
+        return pa.array(values, type=arrow_type(dtype))
+    if dtype == "json":
+        return pa.array([None if value is None else json.dumps(value) for value in values], type=pa.string())
+    try:
+        return pa.array(values, type=arrow_type(dtype))
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # a document with an unexpected value type (e.g. a string metric) becomes null
+        cast = float if dtype == "float64" else int if dtype == "int64" else str
+        coerced = []
+        for value in values:
+            try:
+                coerced.append(None if value is None else cast(value))
+            except (TypeError, ValueError):
+                coerced.append(None)
+        return pa.array(coerced, type=arrow_type(dtype))
+
+class ParquetSink:
+    def __init__(self, root:str, batch_size:int=50_000, compression:str="zstd", name:str="part"):
+        _require_pyarrow()
+        self.root = root
+        self.batch_size = batch_size
+        self.compression = compression
+        self.name = name
+        self.rows_written = 0
+        self._buffers: Dict[Tuple[str, str, str], List[List[Any]]] = {}
+        self._writers: Dict[Tuple[str, str, str], Any] = {}
+        self._schemas: Dict[str, Schema] = {}
+        self._stamps: Dict[str, List[int]] = {} # per schema, the indexes of its timestamp fields
+        self._hours: Dict[int, Tuple[str, str]] = {}
+
+    def partition(self, stream:str, millis:Optional[int])->Tuple[str, str, str]:
+        # 1735823045000 (2025-01-02T13:04:05Z) -> ("metrics", "2025-01-02", "13"), in UTC
+        hour = (millis or 0) // 3_600_000
+        date_hour = self._hours.get(hour)
+        if date_hour is None:
+            start = EPOCH + timedelta(hours=hour)
+            date_hour = self._hours[hour] = (start.strftime("%Y-%m-%d"), start.strftime("%H"))
+        return (stream,) + date_hour
+
+    def path(self, key:Tuple[str, str, str])->str:
+        stream, date, hour = key
+        return os.path.join(self.root, f"stream={stream}", f"date={date}", f"hour={hour}", f"{self.name}.parquet")
+
+    def partial_path(self, key:Tuple[str, str, str])->str:
+        # hidden until close(): dataset readers skip dot files, so a failed run never shows up
+        directory, name = os.path.split(self.path(key))
+        return os.path.join(directory, f".{name}.partial")
+
+    def write(self, schema:Schema, values:List[Any]):
+        stamps = self._stamps.get(schema.name)
+        if stamps is None:
+            self._schemas[schema.name] = schema
+            stamps = self._stamps[schema.name] = [i for i, field in enumerate(schema.fields) if field.dtype == "timestamp"]
+        if stamps:
+            # parsed once: the same UTC millis fill the column and pick the partition
+            values = list(values)
+            for i in stamps:
+                values[i] = epoch_millis(values[i])
+        key = self.partition(schema.name, values[stamps[0]] if stamps else None)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = [[] for _ in schema.fields]
+        for column, value in zip(buffer, values):
+            column.append(value)
+        if len(buffer[0]) >= self.batch_size:
+            self.flush(key)
+
+    def flush(self, key:Tuple[str, str, str]):
+        buffer = self._buffers.pop(key, None)
+        if not buffer or not buffer[0]:
+            return
+        schema = self._schemas[key[0]]
+        table = pa.Table.from_arrays(
+            [_column(values, field.dtype) for values, field in zip(buffer, schema.fields)],
+            schema=arrow_schema(schema)
+        )
+        writer = self._writers.get(key)
+        if writer is None:
+            path = self.partial_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writer = self._writers[key] = pq.ParquetWriter(path, table.schema, compression=self.compression)
+        # each flush is one row group, with min/max statistics for pushdown
+        writer.write_table(table, row_group_size=self.batch_size)
+        self.rows_written += table.num_rows
+
+    def close(self):
+        for key in list(self._buffers):
+            self.flush(key)
+        for key, writer in self._writers.items():
+            writer.close()
+            os.replace(self.partial_path(key), self.path(key))
+        self._writers.clear()
+
+    def abort(self):
+        # drops everything written so far; a part file is either complete or absent
+        self._buffers.clear()
+        for key, writer in self._writers.items():
+            writer.close()
+            os.remove(self.partial_path(key))
+        self._writers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class ParquetLoad:
+    # Columnar counterpart of Load: takes raw hits (not formatted lines) and writes
+    # one part file per cut_off window into each stream/date/hour partition.
+    def __init__(self, logs:Iterable[Dict[str, Any]], log_info:Dict, save_dir:str, extractor:FieldExtractor=None, batch_size:int=50_000, compression:str="zstd"):
+        self.logs = logs
+        self.log_info = log_info
+        self.save_dir = save_dir
+        self.extractor = extractor or FieldExtractor()
+        self.batch_size = batch_size
+        self.compression = compression
+        self.run()
+
+    @property
+    def part_name(self):
+        return "part-{}-{}".format(self.log_info["start_time"], self.log_info["end_time"]).replace(":", "")
+
+    def run(self):
+        self.skipped = 0 # hits no schema covers
+        with ParquetSink(self.save_dir, self.batch_size, self.compression, name=self.part_name) as sink:
+            for log in self.logs:
+                schema, values = self.extractor.values(log)
+                if schema is not None:
+                    sink.write(schema, values)
+                else:
+                    self.skipped += 1
+        self.rows_written = sink.rows_written
+
+def read_parquet(root:str, stream:str, columns:List[str]=None, start_time:str=None, end_time:str=None):
+    # Reads one stream back from a ParquetSink tree: date/hour prune directories
+    # and the @timestamp range is pushed down to row-group statistics.
+    _require_pyarrow()
+    dataset = ds.dataset(os.path.join(root, f"stream={stream}"), format="parquet", partitioning="hive")
+    conditions = []
+    if start_time is not None:
+        start = epoch_millis(start_time)
+        conditions.append(ds.field("date") >= (EPOCH + start * MILLISECOND).strftime("%Y-%m-%d"))
+        conditions.append(ds.field("timestamp") >= pa.scalar(start, type=arrow_type("timestamp")))
+    if end_time is not None:
+        end = epoch_millis(end_time)
+        conditions.append(ds.field("date") <= (EPOCH + end * MILLISECOND).strftime("%Y-%m-%d"))
+        conditions.append(ds.field("timestamp") < pa.scalar(end, type=arrow_type("timestamp")))
+    condition = None
+    for item in conditions:
+        condition = item if condition is None else condition & item
+    return dataset.to_table(columns=columns, filter=condition)
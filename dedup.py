@@ -0,0 +1,153 @@
+# Bounded-memory deduplication of hits across extraction windows and runs.
+# Window mode asks for gte/lte ranges whose ends touch, so a document stamped on a
+# boundary comes back twice; retried windows and resumed runs add more. Recent keys
+# (_index/_id) live in exact sets, one per generation of `recent/generations` keys;
+# when a generation ages out its keys move into a scalable Bloom filter (each new
+# filter twice the capacity and half the error rate of the last, so the combined
+# false-positive rate stays under `error_rate`). A false positive drops a real hit,
+# so keep error_rate small. The state is saved next to the run_etl checkpoint.
+
+import hashlib
+import json
+import math
+import os
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List
+
+from checkpoint import index_name
+
+class BloomFilter:
+    def __init__(self, capacity:int, error_rate:float, bits:bytearray=None, count:int=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2)**2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+        self.count = count
+
+    @property
+    def full(self)->bool:
+        return self.count >= self.capacity
+
+    def _positions(self, key:str)->Iterator[int]:
+        # double hashing: h1 + i*h2 over one 128-bit digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i*h2) % self.size
+
+    def add(self, key:str):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key:str)->bool:
+        bits = self.bits
+        # most new keys stop at the first unset bit
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+class Deduplicator:
+    def __init__(
+        self,
+        path:str=None, # state file; loaded if present, written by save()
+        recent:int=200000, # keys kept exactly
+        generations:int=4,
+        capacity:int=1000000, # keys in the first Bloom filter
+        error_rate:float=1e-6, # bound on the combined false-positive rate of the Bloom filters
+        key:str="index_id", # "index_id" (_index/_id) or "id"
+        resume:bool=True # load the saved state from path
+    ):
+        self.path = path
+        self.recent = recent
+        self.generations = generations
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.key_type = key
+        self.exact = deque([set()])
+        self.blooms: List[BloomFilter] = []
+        self.duplicates = 0 # found in the exact sets
+        self.probable = 0 # found only in a Bloom filter
+        if resume and path and os.path.exists(path):
+            self.load(path)
+
+    @classmethod
+    def for_url(cls, url:str, state_dir:str="./logs/.checkpoints", **kwargs):
+        return cls(os.path.join(state_dir, f"{index_name(url)}.dedup"), **kwargs)
+
+    def key(self, hit:Dict[str, Any])->str:
+        if self.key_type == "id":
+            return hit["_id"]
+        return f"{hit.get('_index', '')}/{hit['_id']}"
+
+    def _spill(self, keys:set):
+        for key in keys:
+            if not self.blooms or self.blooms[-1].full:
+                if self.blooms:
+                    last = self.blooms[-1]
+                    self.blooms.append(BloomFilter(last.capacity*2, last.error_rate/2))
+                else:
+                    self.blooms.append(BloomFilter(self.capacity, self.error_rate/2))
+            self.blooms[-1].add(key)
+
+    def add(self, key:str):
+        current = self.exact[-1]
+        current.add(key)
+        if len(current) >= max(1, self.recent // self.generations):
+            self.exact.append(set())
+            while len(self.exact) > self.generations:
+                self._spill(self.exact.popleft())
+
+    def seen(self, key:str)->bool:
+        for keys in reversed(self.exact):
+            if key in keys:
+                self.duplicates += 1
+                return True
+        for bloom in self.blooms:
+            if key in bloom:
+                self.probable += 1
+                return True
+        return False
+
+    def unique(self, hits:Iterable[Dict[str, Any]])->Iterator[Dict[str, Any]]:
+        for hit in hits:
+            key = self.key(hit)
+            if not self.seen(key):
+                self.add(key)
+                yield hit
+
+    def filter(self, hits:Iterable[Dict[str, Any]])->List[Dict[str, Any]]:
+        return list(self.unique(hits))
+
+    def save(self, path:str=None):
+        # one JSON header line (settings, exact keys, filter sizes) followed by the filters' bits
+        path = path or self.path
+        header = {
+            "key": self.key_type, "recent": self.recent, "generations": self.generations,
+            "exact": [sorted(keys) for keys in self.exact],
+            "blooms": [{"capacity": bloom.capacity, "error_rate": bloom.error_rate, "count": bloom.count} for bloom in self.blooms],
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            for bloom in self.blooms:
+                f.write(bloom.bits)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def load(self, path:str):
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            self.key_type = header["key"]
+            self.exact = deque(set(keys) for keys in header["exact"]) or deque([set()])
+            self.blooms = []
+            for spec in header["blooms"]:
+                bloom = BloomFilter(spec["capacity"], spec["error_rate"], count=spec["count"])
+                bloom.bits = bytearray(f.read(len(bloom.bits)))
+                self.blooms.append(bloom)
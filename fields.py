@@ -0,0 +1,323 @@
+# Declarative field extraction shared by Transform and the get_*.py scripts.
+# Each Field names a path into an Elasticsearch _source document the way the
+# document stores it: dots walk nested objects ({"host": {"name": ...}}) and a
+# quoted key is one flattened key ({"data_stream.type": ...}). Each schema's paths
+# are compiled once into plain nested .get() chains, one generated function per call.
+
+import linecache
+import math
+import re
+from string import Formatter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# a path step is a key, a ['quoted.key'] (one key with dots in it) or an [index]
+_STEP = re.compile(r"\.?([^.\[\]]+)|\['([^']+)'\]|\[(\d+)\]")
+
+class Field(NamedTuple):
+    name: str
+    path: str # "host.name" walks nested objects; "['system.cpu.usage']" is one flattened key
+    default: Any = None
+    convert: Callable = None
+    column: str = None # header used by row(); defaults to name
+    dtype: str = "string" # string, float64, int64, timestamp or json (columnar sinks)
+
+def us_to_s(value):
+    return value / 1_000_000
+
+def to_int(value):
+    # Kong/nginx write "-" for absent numbers and logstash keeps status as a string
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def split_path(path:str)->List[Any]:
+    # "transaction['duration.histogram'].values[0]" -> ["transaction", "duration.histogram", "values", 0]
+    steps, end = [], 0
+    for match in _STEP.finditer(path):
+        if match.start() != end or (match.group(0).startswith(".") and not steps):
+            break
+        key, quoted, index = match.groups()
+        steps.append(int(index) if index is not None else key if key is not None else quoted)
+        end = match.end()
+    if end != len(path) or not steps:
+        raise ValueError(f"bad field path {path!r}")
+    return steps
+
+def source_path(path:str)->str:
+    # the dotted name Elasticsearch knows the field by, for _source includes and aggregations
+    return ".".join(step for step in split_path(path) if step.__class__ is str)
+
+def _emit(node:str, entries:List[Tuple[List[Any], str]], depth:int, indent:str, lines:List[str]):
+    # Emits plain nested lookups setting each (steps, var) entry from the dict or list
+    # in `node`, or None when a step is missing. Fields sharing a prefix share its
+    # lookups; temporaries are named by depth, keeping the generated frame small.
+    get = f"{node}.get"
+    child = f"n{depth}"
+    groups = {}
+    for steps, var in entries:
+        groups.setdefault(steps[0], []).append((steps[1:], var))
+    for step, group in groups.items():
+        if step.__class__ is int:
+            value = f"{node}[{step}] if len({node}) > {step} else None"
+        else:
+            value = f"{get}({step!r})"
+        leaves = [var for rest, var in group if not rest]
+        if leaves:
+            lines.append(f"{indent}{' = '.join(leaves)} = {value}")
+        nested = [(rest, var) for rest, var in group if rest]
+        if not nested:
+            continue
+        lines.append(f"{indent}{child} = {leaves[0] if leaves else value}")
+        kinds = {rest[0].__class__ for rest, _ in nested}
+        for kind in (str, int):
+            if kind not in kinds:
+                continue
+            below = [(rest, var) for rest, var in nested if rest[0].__class__ is kind]
+            lines.append(f"{indent}if {child}.__class__ is {'dict' if kind is str else 'list'}:")
+            _emit(child, below, depth+1, indent+"    ", lines)
+            lines.append(f"{indent}else:")
+            lines.append(f"{indent}    {' = '.join(dict.fromkeys(var for _, var in below))} = None")
+
+def _resolve(paths:List[str], indent:str)->List[str]:
+    # lines setting v0..vN (None when absent) for each path into `source`
+    lines = []
+    _emit("source", [(split_path(path), f"v{i}") for i, path in enumerate(paths)], 0, indent, lines)
+    return lines
+
+def _define(code:str, filename:str, namespace:Dict[str, Any]):
+    # registered with linecache, so tracebacks and pdb show the generated source
+    linecache.cache[filename] = (len(code), None, code.splitlines(True), filename)
+    exec(compile(code, filename, "exec"), namespace)
+
+def _outputs(fields:List[Field], tag:str, namespace:Dict[str, Any])->List[str]:
+    # the expression giving each field's final value from v0..vN
+    out = []
+    for i, field in enumerate(fields):
+        namespace[f"{tag}convert{i}"] = field.convert
+        if field.default.__class__ in (str, int, bool) or (field.default.__class__ is float and math.isfinite(field.default)):
+            default = repr(field.default) # a constant rather than a global lookup
+        else:
+            default = f"{tag}default{i}"
+            namespace[default] = field.default
+        value = f"{tag}convert{i}(v{i})" if field.convert else f"v{i}"
+        out.append(value if field.default is None and not field.convert else f"{default} if v{i} is None else {value}")
+    return out
+
+def _fstring(template:str, names:List[str], outputs:List[str])->str:
+    # "[{timestamp}] {host_name}" -> f"[{(v0)}] {(v1)}", so a line is one f-string
+    index = dict(zip(names, outputs))
+    out = []
+    for literal, name, spec, conversion in Formatter().parse(template):
+        out.append(literal.replace("{", "{{").replace("}", "}}"))
+        if name is not None:
+            out.append("{(" + index[name] + ")" + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + "}")
+    return "f" + repr("".join(out))
+
+def _compile(name:str, fields:List[Field], names:List[str], columns:List[str], template:str)->Tuple[Callable, Callable, Callable]:
+    # Generates straight-line values()/row()/line() functions, so a document costs one
+    # dict lookup per path step and no Python-level loops or calls.
+    namespace = {}
+    body = "\n".join(_resolve([field.path for field in fields], "    "))
+    out = _outputs(fields, "", namespace)
+    items = ", ".join(f"{column!r}: {value}" for column, value in zip(columns, out))
+    _define("\n".join([
+        f"def values(source):\n{body}\n    return [{', '.join(out)}]",
+        f"def row(source):\n{body}\n    return {{{items}}}",
+        f"def line(source):\n{body}\n    return {_fstring(template, names, out)}",
+    ]), f"<schema {name}>", namespace)
+    return namespace["values"], namespace["row"], namespace["line"]
+
+def _compile_dispatch(stream_path:str, schemas:Dict[str, "Schema"])->Tuple[Callable, Callable]:
+    # One generated function per extractor: the stream is read once and each schema's
+    # body is inlined in its branch, so a hit costs a single call.
+    namespace = {"EMPTY": {}}
+    head = ["    source = hit.get('_source', EMPTY)"]
+    head += _resolve([stream_path], "    ") + ["    stream = v0"]
+    values, lines = list(head), list(head)
+    for k, (stream, schema) in enumerate(schemas.items()):
+        body = [f"    {'if' if k == 0 else 'elif'} stream == {stream!r}:"] + _resolve([field.path for field in schema.fields], "        ")
+        out = _outputs(schema.fields, f"s{k}_", namespace)
+        namespace[f"schema{k}"] = schema
+        values += body + [f"        return schema{k}, [{', '.join(out)}]"]
+        lines += body + [f"        return {_fstring(schema.template, schema.names, out)}"]
+    _define("\n".join([
+        "def values(hit):\n" + "\n".join(values + ["    return None, None"]),
+        "def line(hit):\n" + "\n".join(lines + ["    return None"]),
+    ]), f"<extractor {stream_path} {' '.join(schemas)}>", namespace)
+    return namespace["values"], namespace["line"]
+
+def compile_getter(path:str)->Callable[[Dict[str, Any]], Any]:
+    # one generated accessor, None when the path is absent
+    namespace = {}
+    _define("def get_path(source):\n" + "\n".join(_resolve([path], "    ")) + "\n    return v0", f"<path {path}>", namespace)
+    return namespace["get_path"]
+
+class Schema:
+    def __init__(self, name:str, fields:List[Field], template:str=None):
+        self.name = name
+        self.fields = list(fields)
+        self.names = [field.name for field in self.fields]
+        self.columns = [field.column or field.name for field in self.fields]
+        head = "".join(part for part, field in (("[{timestamp}] ", "timestamp"), ("| HOST: {host_name} ", "host_name")) if field in self.names)
+        self.template = template or head + "| " + ", ".join(
+            f"{name}: {{{name}}}" for name in self.names if name not in ("timestamp", "host_name")
+        )
+        # values(source) -> list, row(source) -> {column: value}, line(source) -> str
+        self.values, self.row, self.line = _compile(name, self.fields, self.names, self.columns, self.template)
+
+    def record(self, source:Dict[str, Any])->Dict[str, Any]:
+        return dict(zip(self.names, self.values(source)))
+
+    def __reduce__(self):
+        # compiled accessors don't pickle; process pools rebuild them from the field specs
+        return (Schema, (self.name, self.fields, self.template))
+
+    def source_includes(self)->List[str]:
+        # _source filter paths: Elasticsearch matches them through arrays and flattened keys
+        return sorted({source_path(field.path) for field in self.fields})
+
+TIMESTAMP = Field("timestamp", "@timestamp", column="Timestamp", dtype="timestamp")
+HOST_NAME = Field("host_name", "host.name", "N/A", column="Host")
+
+METRICS_FIELDS = [
+    TIMESTAMP,
+    HOST_NAME,
+    Field("system_cpu_usage", "['system.cpu.usage']", column="System CPU Usage", dtype="float64"),
+    Field("process_cpu_usage", "['process.cpu.usage']", column="Process CPU Usage", dtype="float64"),
+    Field("system_cpu_count", "['system.cpu.count']", column="System CPU Count", dtype="int64"),
+    Field("jvm_system_cpu_load_1m", "['process.runtime.jvm.system.cpu.load_1m']", column="jvm_system_cpu_load_1m", dtype="float64"),
+    Field("jvm_cpu_utilization", "['process.runtime.jvm.cpu.utilization']", column="jvm_cpu_utilization", dtype="float64"),
+    Field("jvm_system_cpu_utilization", "['process.runtime.jvm.system.cpu.utilization']", column="jvm_system_cpu_utilization", dtype="float64"),
+    Field("jvm_memory_committed", "['jvm.memory.committed']", column="jvm.memory.committed", dtype="float64"),
+    Field("jvm_memory_max", "['jvm.memory.max']", column="jvm.memory.max", dtype="float64"),
+    Field("jvm_memory_used", "['jvm.memory.used']", column="jvm.memory.used", dtype="float64"),
+    Field("jvm_buffer_memory_used", "['jvm.buffer.memory.used']", column="jvm.buffer.memory.used", dtype="float64"),
+    Field("jvm_memory_usage_after_gc", "['jvm.memory.usage.after.gc']", column="jvm.memory.usage.after.gc", dtype="float64"),
+    Field("jvm_gc_memory_allocated", "['jvm.gc.memory.allocated']", column="jvm.gc.memory.allocated", dtype="float64"),
+    Field("jvm_gc_memory_promoted", "['jvm.gc.memory.promoted']", column="jvm.gc.memory.promoted", dtype="float64"),
+    Field("process_runtime_jvm_memory_init", "['process.runtime.jvm.memory.init']", column="process.runtime.jvm.memory.init", dtype="float64"),
+    Field("process_runtime_jvm_memory_limit", "['process.runtime.jvm.memory.limit']", column="process.runtime.jvm.memory.limit", dtype="float64"),
+    Field("process_runtime_jvm_memory_usage", "['process.runtime.jvm.memory.usage']", column="process.runtime.jvm.memory.usage", dtype="float64"),
+    Field("process_runtime_jvm_memory_committed", "['process.runtime.jvm.memory.committed']", column="process.runtime.jvm.memory.committed", dtype="float64"),
+    Field("process_runtime_jvm_memory_usage_after_last_gc", "['process.runtime.jvm.memory.usage_after_last_gc']", column="process.runtime.jvm.memory.usage_after_last_gc", dtype="float64"),
+    Field("system_memory_utilization", "['system.memory.utilization']", column="system.memory.utilization", dtype="float64"),
+    Field("system_memory_usage", "['system.memory.usage']", column="system.memory.usage", dtype="float64"),
+    Field("latency", "transaction['duration.histogram'].values[0]", column="Latency", dtype="float64"),
+    Field("error_rate", "transaction.result", column="Error Rate"),
+    Field("number_of_requests", "_doc_count", 0, column="Number of Requests", dtype="int64"),
+]
+
+LOGS_FIELDS = [
+    TIMESTAMP,
+    HOST_NAME,
+    Field("message", "message", "", column="Message"),
+    Field("error_info", "error", {}, dtype="json"),
+    Field("error_code", "error.exception[0].type", "", column="Error code"),
+    Field("error_cause", "error.exception[0].message", "", column="Error cause"),
+]
+
+TRACES_FIELDS = [
+    TIMESTAMP,
+    HOST_NAME,
+    Field("transaction_name", "transaction.name", ""),
+    Field("transaction_duration", "transaction.duration.us", 0.0, us_to_s, dtype="float64"),
+    Field("transaction_id", "transaction.id", ""),
+    Field("transaction_type", "transaction.type", ""),
+    Field("span_name", "span.name", ""),
+    Field("span_duration", "span.duration.us", 0, dtype="int64"),
+    Field("span_subtype", "span.subtype", ""),
+    Field("span_type", "span.type", ""),
+    Field("span_id", "span.id", ""),
+]
+
+# metricbeat system module documents carry no data_stream.type; they are
+# dispatched on agent.type (nested) with METRICBEAT_SCHEMAS instead
+METRICBEAT_FIELDS = [
+    TIMESTAMP,
+    HOST_NAME,
+    Field("dataset", "event.dataset", ""),
+    Field("cpu_cores", "system.cpu.cores", dtype="int64"),
+    Field("cpu_total_norm_pct", "system.cpu.total.norm.pct", dtype="float64"),
+    Field("memory_used_pct", "system.memory.used.pct", dtype="float64"),
+    Field("memory_actual_used_pct", "system.memory.actual.used.pct", dtype="float64"),
+    Field("memory_actual_used_bytes", "system.memory.actual.used.bytes", dtype="int64"),
+    Field("load_1", "system.load.1", dtype="float64"),
+    Field("load_5", "system.load.5", dtype="float64"),
+    Field("load_15", "system.load.15", dtype="float64"),
+    Field("network_name", "system.network.name", ""),
+    Field("network_in_bytes", "system.network.in.bytes", dtype="int64"),
+    Field("network_out_bytes", "system.network.out.bytes", dtype="int64"),
+]
+
+# the logs/traces templates keep the line layout Load has always written
+SCHEMAS = {
+    "metrics": Schema("metrics", METRICS_FIELDS),
+    "logs": Schema("logs", LOGS_FIELDS, (
+        "[{timestamp}] | HOST: {host_name} "
+        "message: {message}"
+        "error_info: {error_info}"
+        "error_code: {error_code}"
+        "error_cause: {error_cause}"
+    )),
+    "traces": Schema("traces", TRACES_FIELDS, (
+        "[{timestamp}] | HOST: {host_name} "
+        "transaction_name: {transaction_name}"
+        "transaction_duration: {transaction_duration}"
+        "transaction_id: {transaction_id}"
+        "transaction_type: {transaction_type}"
+        "span_name: {span_name}"
+        "span_duration: {span_duration}"
+        "span_subtype: {span_subtype}"
+        "span_type: {span_type}"
+        "span_id: {span_id}"
+    )),
+}
+
+METRICBEAT_SCHEMAS = {
+    "metricbeat": Schema("metricbeat", METRICBEAT_FIELDS),
+}
+
+# Kong access records as parsed by logstash (event.dataset "kong.log"); service,
+# route and latencies only exist when Kong's http-log/file-log plugins ship them
+KONG_FIELDS = [
+    TIMESTAMP,
+    Field("method", "http_method", ""),
+    Field("path", "path", ""),
+    Field("status", "status", convert=to_int, dtype="int64"),
+    Field("bytes_sent", "body_bytes_sent", convert=to_int, dtype="int64"),
+    Field("remote_address", "remote_address", ""),
+    Field("user_agent", "http_user_agent", ""),
+    Field("request_id", "kong_request_id", ""),
+    Field("service", "service.name", ""),
+    Field("route", "route.name", ""),
+    Field("latency_ms", "latencies.request", dtype="float64"),
+    Field("upstream_latency_ms", "latencies.proxy", dtype="float64"),
+    Field("kong_latency_ms", "latencies.kong", dtype="float64"),
+]
+
+class FieldExtractor:
+    def __init__(self, schemas:Dict[str, Schema]=None, stream_path:str="['data_stream.type']"):
+        self.schemas = SCHEMAS if schemas is None else schemas
+        self.stream_key = stream_path
+        self.stream_type = compile_getter(stream_path)
+        # values(hit) -> (schema, list) and line(hit) -> str; (None, None) and None for documents no schema covers
+        self.values, self.line = _compile_dispatch(stream_path, self.schemas)
+
+    def schema(self, source:Dict[str, Any])->Optional[Schema]:
+        return self.schemas.get(self.stream_type(source))
+
+    def __reduce__(self):
+        return (FieldExtractor, (self.schemas, self.stream_key))
+
+    def source_includes(self)->List[str]:
+        # every path any schema reads, plus the one used to pick the schema
+        paths = {source_path(self.stream_key)}
+        for schema in self.schemas.values():
+            paths.update(schema.source_includes())
+        return sorted(paths)
+
+    def rows(self, hits:Iterable[Dict[str, Any]], stream:str)->Iterator[Dict[str, Any]]:
+        schema = self.schemas[stream]
+        for hit in hits:
+            yield schema.row(hit.get("_source", {}))
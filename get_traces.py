@@ -1,40 +1,20 @@
 # Class TRACES
 import pandas as pd
-import json
 
-# Load the JSON data from the file
-with open('/Users/longcaca/Downloads/example/ETL-Flow-DataCentric/logs/traces-apm.json', 'r') as file:  # Replace with your actual file path
-    data = json.load(file)
+from json_stream import iter_hits
+from fields import Schema, TRACES_FIELDS
 
-# Prepare a list to hold the extracted records
-extracted_data = []
+# traces.csv keeps transaction_duration in microseconds, Transform writes seconds
+TRACES_CSV = Schema("traces", [
+    field._replace(default=0, convert=None, dtype="int64") if field.name == "transaction_duration" else field
+    for field in TRACES_FIELDS if field.name != "host_name"
+])
 
-# Iterate through each hit in the JSON data
-for hit in data['hits']['hits']:
-    source = hit['_source']
-    
-    # Extract relevant fields
-    transaction = source.get('transaction', {})
-    
-    # Ensure duration is accessed correctly and converted to seconds
-    duration_us = transaction.get('duration', {}).get('us', 0)  # Default to 0 if not found
-    
-    record = { #
-        'Timestamp': source.get('@timestamp', None),
-        
-        'transaction_name': transaction.get('name', ''),
-        'transaction_duration': duration_us,
-        'transaction_id': transaction.get('id', ''),
-        'transaction_type': transaction.get('type', ''),
-        
-        'span_name': source.get('span', {}).get('name', ''),
-        'span_duration': source.get('span', {}).get('duration', {}).get('us', 0),
-        'span_subtype': source.get('span', {}).get('subtype', ''),
-        'span_id': source.get('span', {}).get('id', ''),
-        'span_id': source.get('span', {}).get('type', ''),
-    }
-    
-    extracted_data.append(record)
+# Stream the hits out of the JSON dump one document at a time
+hits = iter_hits('/Users/longcaca/Downloads/example/ETL-Flow-DataCentric/logs/traces-apm.json')  # Replace with your actual file path
+
+# Extract relevant fields for each hit (field specs in fields.py)
+extracted_data = [TRACES_CSV.row(hit['_source']) for hit in hits]
 
 # Create a DataFrame from the extracted data
 df = pd.DataFrame(extracted_data)
@@ -42,4 +22,3 @@ df = pd.DataFrame(extracted_data)
 # Print the first 10 rows of the DataFrame
 print(df.head(10))
 df.to_csv('/Users/longcaca/Downloads/example/ETL-Flow-DataCentric/traces.csv'  ,  index = False )
-
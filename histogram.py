@@ -0,0 +1,109 @@
+# Mergeable latency histograms with relative-error buckets (DDSketch-style).
+# A value v > 0 lands in bucket ceil(log(v) / log(gamma)), gamma = (1+a)/(1-a),
+# so every quantile is within relative accuracy `a` of an exact one no matter the
+# range. Two histograms with the same accuracy merge by adding bucket counts, which
+# is what lets per-window histograms roll up into per-day ones. Past max_buckets the
+# lowest buckets are folded together, so memory stays fixed and only the smallest
+# quantiles lose accuracy.
+
+import math
+from typing import Any, Dict, Iterable, Optional
+
+class Histogram:
+    def __init__(self, relative_accuracy:float=0.01, max_buckets:int=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.counts: Dict[int, int] = {}
+        self.zeros = 0 # values <= 0
+        self.count = 0
+        self.total = 0.0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+
+    def add(self, value:float, count:int=1):
+        if value > 0:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.counts[key] = self.counts.get(key, 0) + count
+            if len(self.counts) > self.max_buckets:
+                self._collapse()
+        else:
+            self.zeros += count
+        self.count += count
+        self.total += value * count
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def _collapse(self):
+        keys = sorted(self.counts)
+        low = keys[:len(keys) - self.max_buckets + 1]
+        self.counts[low[-1]] += sum(self.counts.pop(key) for key in low[:-1])
+
+    def extend(self, values:Iterable[float]):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other:"Histogram")->"Histogram":
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(f"cannot merge histograms with accuracy {self.relative_accuracy} and {other.relative_accuracy}")
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        if len(self.counts) > self.max_buckets:
+            self._collapse()
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+            self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        return self
+
+    @property
+    def mean(self)->Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q:float)->Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return min(0.0, self.maximum)
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if rank < seen:
+                # bucket midpoint in relative terms, kept inside the observed range
+                value = 2 * self.gamma**key / (self.gamma + 1)
+                return max(self.minimum, min(self.maximum, value))
+        return self.maximum
+
+    def percentiles(self, percents:Iterable[float]=(50, 90, 99))->Dict[str, Optional[float]]:
+        return {f"p{percent:g}": self.quantile(percent / 100) for percent in percents}
+
+    def summary(self, percents:Iterable[float]=(50, 90, 99))->Dict[str, Any]:
+        return {"count": self.count, "mean": self.mean, "min": self.minimum, "max": self.maximum, **self.percentiles(percents)}
+
+    def to_dict(self)->Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy, "max_buckets": self.max_buckets, "counts": {str(key): count for key, count in self.counts.items()},
+            "zeros": self.zeros, "count": self.count, "total": self.total, "min": self.minimum, "max": self.maximum,
+        }
+
+    @classmethod
+    def from_dict(cls, data:Dict[str, Any])->"Histogram":
+        histogram = cls(data["relative_accuracy"], data.get("max_buckets", 2048))
+        histogram.counts = {int(key): count for key, count in data["counts"].items()}
+        histogram.zeros = data["zeros"]
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.minimum = data["min"]
+        histogram.maximum = data["max"]
+        return histogram
+
+def merge_all(histograms:Iterable[Histogram], relative_accuracy:float=0.01)->Histogram:
+    merged = Histogram(relative_accuracy)
+    for histogram in histograms:
+        merged.merge(histogram)
+    return merged
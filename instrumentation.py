@@ -0,0 +1,177 @@
+# Per-window, per-stage run statistics for the ETL.
+# ExtractMetricBeatLogs records one "request" event per _search (latency, decoded
+# and wire bytes, hits.total, returned hits, miss_count, retries, parse time) and a "window" event
+# for windows that failed; run_etl adds "stage" events for extract (fetching and
+# filtering pages, requests included), transform and write, "duplicates" events for hits dropped by the dedup stage
+# and "skipped" events for hits no schema covers.
+# Events are appended to a JSON-lines file as they happen; summary() and
+# write_prometheus() aggregate them for the whole run.
+
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from checkpoint import atomic_write
+
+def percentile(values:List[float], q:float)->Optional[float]:
+    # nearest-rank on an already sorted list
+    if not values:
+        return None
+    return values[min(len(values), max(1, math.ceil(q * len(values)))) - 1]
+
+class RunStats:
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, path:str=None, prometheus_path:str=None, labels:Dict[str, str]=None):
+        self.path = path
+        self.prometheus_path = prometheus_path
+        self.labels = labels or {}
+        self.started = time.time()
+        self.latencies = []
+        self.counters = {
+            "requests": 0, "cached": 0, "errors": 0, "retries": 0, "response_bytes": 0, "wire_bytes": 0,
+            "hits_total": 0, "hits": 0, "missed": 0, "failed_windows": 0, "duplicates": 0, "probable_duplicates": 0, "skipped": 0,
+        }
+        self.stage_seconds = {"request": 0.0, "parse": 0.0, "transform": 0.0, "write": 0.0}
+        self.stage_counts = {"transform": 0, "write": 0}
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a") if path else None
+
+    def _emit(self, event:Dict[str, Any]):
+        if self._file:
+            self._file.write(json.dumps({"ts": round(time.time(), 3), **self.labels, **event}) + "\n")
+            self._file.flush()
+
+    def request(self, gte:str, lt:str, latency:float=0.0, size:int=0, wire:int=0, hits_total:int=None, hits:int=0,
+                miss_count:int=None, retries:int=0, parse:float=0.0, source:str="cluster", error:str=None):
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters["retries"] += retries
+            if error:
+                self.counters["errors"] += 1
+            elif source == "cache":
+                self.counters["cached"] += 1
+            else:
+                self.latencies.append(latency)
+                self.counters["response_bytes"] += size
+                self.counters["wire_bytes"] += wire
+                self.stage_seconds["request"] += latency
+            self.counters["hits_total"] += hits_total or 0
+            self.counters["hits"] += hits
+            if miss_count is not None and miss_count < 0:
+                self.counters["missed"] += -miss_count
+            self.stage_seconds["parse"] += parse
+            self._emit({
+                "event": "request", "gte": gte, "lt": lt, "source": source, "latency_s": round(latency, 6),
+                "bytes": size, "wire_bytes": wire, "hits_total": hits_total, "hits": hits, "miss_count": miss_count,
+                "retries": retries, "parse_s": round(parse, 6), "error": error
+            })
+
+    def stage(self, stage:str, gte:str, lt:str, seconds:float, count:int=0):
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.stage_counts[stage] = self.stage_counts.get(stage, 0) + count
+            self._emit({"event": "stage", "stage": stage, "gte": gte, "lt": lt, "seconds": round(seconds, 6), "count": count})
+
+    def stage_total(self, stage:str)->float:
+        with self._lock:
+            return self.stage_seconds.get(stage, 0.0)
+
+    def duplicates(self, gte:str, lt:str, exact:int, probable:int=0):
+        # probable: matched only a Bloom filter, so possibly a false positive
+        with self._lock:
+            self.counters["duplicates"] += exact + probable
+            self.counters["probable_duplicates"] += probable
+            self._emit({"event": "duplicates", "gte": gte, "lt": lt, "count": exact + probable, "probable": probable})
+
+    def skipped(self, gte:str, lt:str, count:int):
+        # hits no schema of the extractor covers, so they produced no output
+        with self._lock:
+            self.counters["skipped"] += count
+            self._emit({"event": "skipped", "gte": gte, "lt": lt, "count": count})
+
+    def failed_window(self, gte:str, lt:str, error:str):
+        with self._lock:
+            self.counters["failed_windows"] += 1
+            self._emit({"event": "window", "status": "failed", "gte": gte, "lt": lt, "error": error})
+
+    def summary(self)->Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            elapsed = time.time() - self.started
+            return {
+                "elapsed_s": round(elapsed, 3),
+                **self.counters,
+                "latency_s": {
+                    **{f"p{int(q*100)}": percentile(latencies, q) for q in self.QUANTILES},
+                    "max": latencies[-1] if latencies else None,
+                    "mean": sum(latencies)/len(latencies) if latencies else None,
+                },
+                "stage_seconds": {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+                "stage_counts": dict(self.stage_counts),
+                "docs_per_s": round(self.counters["hits"]/elapsed, 1) if elapsed else None,
+            }
+
+    def write_prometheus(self, path:str=None):
+        path = path or self.prometheus_path
+        summary = self.summary()
+        def sample(metric, value, **extra):
+            labels = ",".join('{}="{}"'.format(key, val) for key, val in sorted({**self.labels, **extra}.items()))
+            value = "NaN" if value is None else value
+            return "{}{{{}}} {}".format(metric, labels, value) if labels else "{} {}".format(metric, value)
+        lines = [
+            "# HELP etl_requests_total _search requests by outcome.",
+            "# TYPE etl_requests_total counter",
+            sample("etl_requests_total", summary["requests"] - summary["cached"] - summary["errors"], outcome="cluster"),
+            sample("etl_requests_total", summary["cached"], outcome="cache"),
+            sample("etl_requests_total", summary["errors"], outcome="error"),
+            "# TYPE etl_request_retries_total counter",
+            sample("etl_request_retries_total", summary["retries"]),
+            "# HELP etl_request_latency_seconds _search latency against the cluster.",
+            "# TYPE etl_request_latency_seconds summary",
+        ]
+        for q in self.QUANTILES:
+            lines.append(sample("etl_request_latency_seconds", summary["latency_s"][f"p{int(q*100)}"], quantile=q))
+        lines += [
+            sample("etl_request_latency_seconds_sum", self.stage_seconds["request"]),
+            sample("etl_request_latency_seconds_count", len(self.latencies)),
+            "# HELP etl_response_bytes_total Response bytes after decompression and as read off the wire.",
+            "# TYPE etl_response_bytes_total counter",
+            sample("etl_response_bytes_total", summary["response_bytes"], encoding="identity"),
+            sample("etl_response_bytes_total", summary["wire_bytes"], encoding="wire"),
+            "# HELP etl_hits_total Hits reported by hits.total, returned, missed by full windows, dropped as duplicates, and skipped by the extractor.",
+            "# TYPE etl_hits_total counter",
+            sample("etl_hits_total", summary["hits_total"], kind="reported"),
+            sample("etl_hits_total", summary["hits"], kind="returned"),
+            sample("etl_hits_total", summary["missed"], kind="missed"),
+            sample("etl_hits_total", summary["duplicates"], kind="duplicate"),
+            sample("etl_hits_total", summary["probable_duplicates"], kind="probable_duplicate"),
+            sample("etl_hits_total", summary["skipped"], kind="skipped"),
+            "# TYPE etl_failed_windows_total counter",
+            sample("etl_failed_windows_total", summary["failed_windows"]),
+            "# HELP etl_stage_seconds_total Time spent per pipeline stage.",
+            "# TYPE etl_stage_seconds_total counter",
+        ]
+        for stage, seconds in sorted(self.stage_seconds.items()):
+            lines.append(sample("etl_stage_seconds_total", seconds, stage=stage))
+        lines += [
+            "# TYPE etl_last_run_timestamp_seconds gauge",
+            sample("etl_last_run_timestamp_seconds", time.time()),
+        ]
+        atomic_write(path, "\n".join(lines) + "\n")
+
+    def close(self)->Dict[str, Any]:
+        summary = self.summary()
+        with self._lock:
+            self._emit({"event": "summary", **summary})
+            if self._file:
+                self._file.close()
+                self._file = None
+        if self.prometheus_path:
+            self.write_prometheus()
+        return summary
@@ -0,0 +1,146 @@
+# Incremental reader for Elasticsearch response dumps (logs/*.json).
+# Streams hits.hits one document at a time instead of json.load()-ing the whole
+# tree. The same iterator also accepts NDJSON (one hit, _source or response per
+# line), a top-level JSON array of hits, and gzip-compressed files of any of these.
+
+import gzip
+import io
+import json
+import re
+from typing import Any, Dict, Iterator, Union
+
+_WS = re.compile(r"[ \t\n\r]*")
+
+class _Reader:
+    def __init__(self, stream, chunk_size:int=1<<16):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size:int)->bool:
+        data = self.stream.read(size)
+        if not data:
+            self.eof = True
+            return False
+        # drop what has been consumed so memory stays around one chunk + one document
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self)->str:
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill(self.chunk_size):
+                return ""
+
+    def expect(self, char:str):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}, got {self.buf[self.pos:self.pos+20]!r}")
+        self.pos += 1
+
+    def value(self)->Any:
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self._fill(size):
+                    raise
+                size *= 2
+                continue
+            # a number cut at the chunk boundary still decodes; read on to be sure
+            if end == len(self.buf) and not self.eof and self._fill(size):
+                continue
+            self.pos = end
+            return value
+
+    def items(self)->Iterator[str]:
+        # yields the keys of the object at the cursor; the caller consumes each value
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError(f"expected ',' or '}}' at offset {self.pos-1}")
+
+    def elements(self)->Iterator[Any]:
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"expected ',' or ']' at offset {self.pos-1}")
+
+def open_dump(path:str):
+    with open(path, "rb") as file:
+        magic = file.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+def _as_hit(document:Dict[str, Any])->Dict[str, Any]:
+    return document if "_source" in document else {"_source": document}
+
+def _iter_object(reader:_Reader)->Iterator[Dict[str, Any]]:
+    # Walks one top-level object key by key. If it is a search response the
+    # hits.hits array is streamed; otherwise the object itself is a hit/_source.
+    document = {}
+    response = False
+    for key in reader.items():
+        if key == "hits" and reader.peek() == "{":
+            response = True
+            hits = {}
+            for inner in reader.items():
+                if inner == "hits" and reader.peek() == "[":
+                    for hit in reader.elements():
+                        yield _as_hit(hit)
+                else:
+                    hits[inner] = reader.value()
+            document[key] = hits
+        else:
+            document[key] = reader.value()
+    if not response:
+        yield _as_hit(document)
+
+def iter_hits(source:Union[str, io.TextIOBase], chunk_size:int=1<<16)->Iterator[Dict[str, Any]]:
+    stream = open_dump(source) if isinstance(source, str) else source
+    try:
+        reader = _Reader(stream, chunk_size)
+        while True:
+            char = reader.peek()
+            if char == "":
+                return
+            if char == "{":
+                yield from _iter_object(reader)
+            elif char == "[":
+                for hit in reader.elements():
+                    yield _as_hit(hit)
+            else:
+                raise ValueError(f"unexpected {char!r} at offset {reader.pos}")
+    finally:
+        if isinstance(source, str):
+            stream.close()
+
+def iter_sources(source:Union[str, io.TextIOBase], chunk_size:int=1<<16)->Iterator[Dict[str, Any]]:
+    for hit in iter_hits(source, chunk_size):
+        yield hit.get("_source", {})
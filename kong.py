@@ -0,0 +1,242 @@
+# Kong access log stage: typed access records and streaming SLO rollups.
+# KongExtractor reads the fields logstash parsed out of each access line (and
+# parses `message` itself when grok failed), skipping the controller's stderr noise.
+# KongRollup keeps, per service / route / status class, request and byte counts and
+# mergeable fixed-size histograms of latency and response size, so a day of gateway
+# traffic is summarised in one pass and per-window rollups merge into daily ones.
+
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from checkpoint import atomic_write
+from fields import KONG_FIELDS, Schema
+from histogram import Histogram
+
+# nginx combined format plus Kong's request id
+ACCESS_LINE = re.compile(
+    r'(?P<remote_address>\S+) \S+ (?P<remote_user>\S+) \[(?P<time_local>[^\]]+)\] '
+    r'"(?P<http_method>[A-Z]+) (?P<path>\S+)(?: (?P<header>[^"]*))?" (?P<status>\d{3}) (?P<body_bytes_sent>\d+|-)'
+    r'(?: "(?P<http_referer>[^"]*)" "(?P<http_user_agent>[^"]*)")?(?: kong_request_id: "(?P<kong_request_id>[^"]*)")?'
+)
+
+# path segments that are ids rather than routes: numbers, hex/base64-ish tokens, uuids
+_ID_SEGMENT = re.compile(r"^(?:\d+|[0-9a-fA-F-]{16,}|(?=[^/]*\d)[A-Za-z0-9_%.=-]{20,})$")
+
+KONG_SCHEMA = Schema("kong", KONG_FIELDS)
+
+def normalize_path(path:str)->str:
+    path = path.split("?", 1)[0]
+    return "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/")) or "/"
+
+class KongExtractor:
+    # duck-types FieldExtractor for Transform and run_etl
+    def __init__(self, schema:Schema=KONG_SCHEMA, parse_message:bool=True):
+        self.schema = schema
+        self.parse_message = parse_message
+
+    def source(self, source:Dict[str, Any])->Optional[Dict[str, Any]]:
+        # the access record as logstash fields, or None for non-access lines
+        if "status" in source:
+            return source
+        if self.parse_message:
+            match = ACCESS_LINE.match(source.get("message", ""))
+            if match:
+                return {**source, **{key: value for key, value in match.groupdict().items() if value is not None}}
+        return None
+
+    def values(self, hit:Dict[str, Any])->Tuple[Optional[Schema], Optional[List[Any]]]:
+        source = self.source(hit.get("_source", {}))
+        return (None, None) if source is None else (self.schema, self.schema.values(source))
+
+    def line(self, hit:Dict[str, Any])->Optional[str]:
+        source = self.source(hit.get("_source", {}))
+        return None if source is None else self.schema.line(source)
+
+    def source_includes(self)->List[str]:
+        return sorted({*self.schema.source_includes(), "message"})
+
+class RollupCell:
+    def __init__(self, relative_accuracy:float=0.01, max_buckets:int=512):
+        self.requests = 0
+        self.bytes = 0
+        self.latency = Histogram(relative_accuracy, max_buckets) # ms, when Kong logs latencies
+        self.size = Histogram(relative_accuracy, max_buckets) # response body bytes
+
+    def merge(self, other:"RollupCell"):
+        self.requests += other.requests
+        self.bytes += other.bytes
+        self.latency.merge(other.latency)
+        self.size.merge(other.size)
+        return self
+
+    def to_dict(self)->Dict[str, Any]:
+        return {"requests": self.requests, "bytes": self.bytes, "latency": self.latency.to_dict(), "size": self.size.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data:Dict[str, Any])->"RollupCell":
+        cell = cls()
+        cell.requests = data["requests"]
+        cell.bytes = data["bytes"]
+        cell.latency = Histogram.from_dict(data["latency"])
+        cell.size = Histogram.from_dict(data["size"])
+        return cell
+
+class KongRollup:
+    def __init__(
+        self,
+        path:str=None, # JSON state; loaded if present, written by save()
+        extractor:KongExtractor=None,
+        service_depth:int=2, # path segments naming the service when Kong doesn't log service.name
+        max_routes:int=2000, # per service; further routes are counted under "{other}"
+        relative_accuracy:float=0.01,
+        max_buckets:int=512
+    ):
+        self.path = path
+        self.extractor = extractor or KongExtractor()
+        self.service_depth = service_depth
+        self.max_routes = max_routes
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.cells: Dict[Tuple[str, str, str], RollupCell] = {}
+        self.routes: Dict[str, set] = {}
+        self.skipped = 0 # non-access lines
+        names = self.extractor.schema.names
+        self._index = {name: names.index(name) for name in ("method", "path", "status", "bytes_sent", "service", "route", "latency_ms")}
+        self.mark = None # the checkpoint state the saved counts belong to, see save()
+        # <path>.prev alone means a save was interrupted between its two steps
+        for candidate in (path, f"{path}.prev") if path else ():
+            if os.path.exists(candidate):
+                self.load(candidate)
+                break
+
+    def key(self, values:List[Any])->Tuple[str, str, str]:
+        index = self._index
+        path = normalize_path(values[index["path"]] or "/")
+        service = values[index["service"]] or "/".join(path.split("/")[:self.service_depth+1]) or "/"
+        route = values[index["route"]] or f"{values[index['method']]} {path}"
+        routes = self.routes.setdefault(service, set())
+        if route not in routes:
+            if len(routes) >= self.max_routes:
+                route = "{other}"
+            routes.add(route)
+        status = values[index["status"]]
+        return service, route, f"{status // 100}xx" if status else "unknown"
+
+    def add_values(self, values:List[Any]):
+        key = self.key(values)
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = RollupCell(self.relative_accuracy, self.max_buckets)
+        cell.requests += 1
+        size = values[self._index["bytes_sent"]]
+        if size is not None:
+            cell.bytes += size
+            cell.size.add(size)
+        latency = values[self._index["latency_ms"]]
+        if latency is not None:
+            cell.latency.add(latency)
+
+    def add(self, hit:Dict[str, Any])->bool:
+        _, values = self.extractor.values(hit)
+        if values is None:
+            self.skipped += 1
+            return False
+        self.add_values(values)
+        return True
+
+    def extend(self, hits:Iterable[Dict[str, Any]])->int:
+        return sum(self.add(hit) for hit in hits)
+
+    def tap(self, hits:Iterable[Dict[str, Any]])->Iterator[Dict[str, Any]]:
+        for hit in hits:
+            self.add(hit)
+            yield hit
+
+    def merge(self, other:"KongRollup")->"KongRollup":
+        for key, cell in other.cells.items():
+            mine = self.cells.get(key)
+            if mine is None:
+                self.cells[key] = RollupCell(self.relative_accuracy, self.max_buckets).merge(cell)
+            else:
+                mine.merge(cell)
+            self.routes.setdefault(key[0], set()).add(key[1])
+        self.skipped += other.skipped
+        return self
+
+    def rows(self, percents:Iterable[float]=(50, 95, 99))->List[Dict[str, Any]]:
+        # one row per service / route / status class
+        rows = []
+        for (service, route, status_class), cell in sorted(self.cells.items()):
+            rows.append({
+                "service": service, "route": route, "status_class": status_class, "requests": cell.requests, "bytes": cell.bytes,
+                **{f"latency_ms_{key}": value for key, value in cell.latency.percentiles(percents).items()},
+                **{f"size_{key}": value for key, value in cell.size.percentiles(percents).items()},
+            })
+        return rows
+
+    def report(self, percents:Iterable[float]=(50, 95, 99), latency_slo_ms:float=None)->List[Dict[str, Any]]:
+        # per service / route across status classes: error ratios and merged latency, busiest first
+        routes = {}
+        for (service, route, status_class), cell in self.cells.items():
+            entry = routes.setdefault((service, route), {"cell": RollupCell(self.relative_accuracy, self.max_buckets), "classes": {}})
+            entry["cell"].merge(cell)
+            entry["classes"][status_class] = entry["classes"].get(status_class, 0) + cell.requests
+        report = []
+        for (service, route), entry in routes.items():
+            cell, requests = entry["cell"], entry["cell"].requests
+            row = {
+                "service": service, "route": route, "requests": requests, "bytes": cell.bytes,
+                "error_5xx_ratio": entry["classes"].get("5xx", 0) / requests,
+                "error_4xx_ratio": entry["classes"].get("4xx", 0) / requests,
+                **{f"latency_ms_{key}": value for key, value in cell.latency.percentiles(percents).items()},
+            }
+            if latency_slo_ms is not None and cell.latency.count:
+                # share of requests over the objective, from the histogram buckets
+                over = sum(count for key, count in cell.latency.counts.items() if cell.latency.gamma**(key-1) >= latency_slo_ms)
+                row["over_latency_slo_ratio"] = over / cell.latency.count
+            report.append(row)
+        return sorted(report, key=lambda row: -row["requests"])
+
+    def save(self, path:str=None, mark:Dict[str, Any]=None):
+        # counts are not idempotent, so run_etl saves them just before the checkpoint write
+        # they belong to, named by `mark`; the save before is kept as <path>.prev for rewind()
+        path = path or self.path
+        if mark is not None:
+            self.mark = mark
+            if os.path.exists(path):
+                os.replace(path, f"{path}.prev")
+        atomic_write(path, json.dumps({
+            "skipped": self.skipped,
+            "cells": [[*key, cell.to_dict()] for key, cell in self.cells.items()],
+            "mark": self.mark,
+        }))
+
+    def rewind(self):
+        # back to the previous save: the last one ran ahead of a checkpoint write that never happened
+        self.cells, self.routes, self.skipped, self.mark = {}, {}, 0, None
+        self.load(f"{self.path}.prev")
+        self.save()
+
+    def load(self, path:str):
+        with open(path, "r") as f:
+            state = json.load(f)
+        self.skipped = state["skipped"]
+        self.mark = state.get("mark")
+        for service, route, status_class, cell in state["cells"]:
+            self.cells[(service, route, status_class)] = RollupCell.from_dict(cell)
+            self.routes.setdefault(service, set()).add(route)
+
+if __name__ == "__main__":
+    import sys
+
+    from json_stream import iter_hits
+
+    # python kong.py <rollup.json> <dump.json> [...]: extend the rollup with each dump and print the report
+    rollup = KongRollup(sys.argv[1])
+    for dump in sys.argv[2:]:
+        print("Rolled up {} access records from {}".format(rollup.extend(iter_hits(dump)), dump))
+    rollup.save()
+    for row in rollup.report()[:20]:
+        print(row)
@@ -0,0 +1,174 @@
+# Typed metrics table and per-host time-series features for the metrics stream.
+# Hits are read with the compiled fields.py accessors into row chunks; each full
+# chunk is converted column by column into preallocated NumPy buffers that grow by
+# doubling (float64 with NaN, int64 with a null mask, datetime64[ms], object for
+# strings), instead of one dict per hit and an all-object DataFrame.
+# features() then resamples per host at several frequencies and adds rolling
+# means/quantiles and per-second rates of counter columns, all vectorized.
+
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from columnar import epoch_millis
+from fields import SCHEMAS, Schema
+
+# cumulative counters, turned into per-second rates
+COUNTERS = ["jvm_gc_memory_allocated", "jvm_gc_memory_promoted"]
+
+NAN = float("nan")
+NAT = np.iinfo(np.int64).min # datetime64's NaT, as int64
+
+_NUMPY = {"float64": np.float64, "int64": np.int64, "timestamp": "datetime64[ms]"}
+
+class ColumnBuffer:
+    def __init__(self, dtype:str, capacity:int=65536):
+        self.dtype = dtype
+        self.size = 0
+        self.values = np.empty(capacity, dtype=_NUMPY.get(dtype, object))
+        # int64 has no NaN, so missing values are tracked separately
+        self.mask = np.zeros(capacity, dtype=bool) if dtype == "int64" else None
+
+    def _reserve(self, extra:int):
+        needed = self.size + extra
+        if needed <= len(self.values):
+            return
+        capacity = max(needed, 2*len(self.values))
+        values = np.empty(capacity, dtype=self.values.dtype)
+        values[:self.size] = self.values[:self.size]
+        self.values = values
+        if self.mask is not None:
+            mask = np.zeros(capacity, dtype=bool)
+            mask[:self.size] = self.mask[:self.size]
+            self.mask = mask
+
+    def extend(self, column:Sequence[Any]):
+        n = len(column)
+        self._reserve(n)
+        target = slice(self.size, self.size+n)
+        if self.dtype == "float64":
+            self.values[target] = _as_float(column)
+        elif self.dtype == "int64":
+            floats = _as_float(column)
+            missing = np.isnan(floats)
+            self.mask[target] = missing
+            self.values[target] = np.where(missing, 0, floats).astype(np.int64)
+        elif self.dtype == "timestamp":
+            # any ISO offset or precision, or epoch millis, parsed like the columnar sink
+            millis = [epoch_millis(value) for value in column]
+            self.values[target] = np.array([NAT if value is None else value for value in millis], dtype=np.int64).view("datetime64[ms]")
+        else:
+            self.values[target] = column
+        self.size += n
+
+    def array(self):
+        values = self.values[:self.size]
+        if self.dtype == "int64":
+            return pd.arrays.IntegerArray(values.copy(), self.mask[:self.size].copy())
+        if self.dtype == "timestamp":
+            return pd.DatetimeIndex(values).tz_localize("UTC")
+        return values.copy()
+
+def _as_float(column:Sequence[Any])->np.ndarray:
+    try:
+        # numpy's own None -> NaN path is about twice as slow as swapping them first
+        return np.array([NAN if value is None else value for value in column], dtype=np.float64)
+    except (TypeError, ValueError):
+        # a stray string value becomes NaN, like the columnar sink does
+        values = np.empty(len(column), dtype=np.float64)
+        for i, value in enumerate(column):
+            try:
+                values[i] = NAN if value is None else float(value)
+            except (TypeError, ValueError):
+                values[i] = NAN
+        return values
+
+class MetricsTable:
+    def __init__(self, schema:Schema=None, chunk_size:int=65536):
+        self.schema = schema or SCHEMAS["metrics"]
+        self.chunk_size = chunk_size
+        self.columns = {field.name: ColumnBuffer(field.dtype, chunk_size) for field in self.schema.fields}
+        self._rows: List[List[Any]] = []
+
+    def __len__(self):
+        return next(iter(self.columns.values())).size + len(self._rows)
+
+    def append(self, source:Dict[str, Any]):
+        self._rows.append(self.schema.values(source))
+        if len(self._rows) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, hits:Iterable[Dict[str, Any]]):
+        values = self.schema.values
+        rows = self._rows
+        for hit in hits:
+            rows.append(values(hit["_source"]))
+            if len(rows) >= self.chunk_size:
+                self.flush()
+                rows = self._rows
+        return self
+
+    def flush(self):
+        if not self._rows:
+            return
+        for buffer, column in zip(self.columns.values(), zip(*self._rows)):
+            buffer.extend(column)
+        self._rows = []
+
+    @classmethod
+    def from_hits(cls, hits:Iterable[Dict[str, Any]], schema:Schema=None, chunk_size:int=65536)->"MetricsTable":
+        return cls(schema, chunk_size).extend(hits)
+
+    def frame(self, columns:str="name")->pd.DataFrame:
+        # columns="name" for field names, "column" for the get_metrics.py headers
+        self.flush()
+        labels = self.schema.names if columns == "name" else self.schema.columns
+        data = {label: buffer.array() for label, buffer in zip(labels, self.columns.values())}
+        return pd.DataFrame(data)
+
+def resample(frame:pd.DataFrame, freq:str="1min", metrics:List[str]=None, how:Sequence[str]=("mean", "max"))->pd.DataFrame:
+    # per host and time bucket; only buckets that have documents are returned
+    metrics = metrics or [name for name in frame.columns if frame[name].dtype.kind in "fiu" or str(frame[name].dtype) == "Int64"]
+    bucket = frame["timestamp"].dt.floor(freq)
+    grouped = frame[metrics].astype("float64").groupby([frame["host_name"], bucket.rename("bucket")], sort=True)
+    result = grouped.agg(list(how))
+    result.columns = [f"{name}_{agg}" for name, agg in result.columns]
+    result["count"] = grouped.size()
+    return result
+
+def rolling(resampled:pd.DataFrame, window:str="5min", columns:List[str]=None, quantiles:Sequence[float]=(0.5, 0.95))->pd.DataFrame:
+    # time-based windows over each host's buckets (index: host_name, bucket)
+    columns = columns or [name for name in resampled.columns if name.endswith("_mean")]
+    per_host = resampled[columns].reset_index(level="host_name").groupby("host_name")[columns]
+    windows = per_host.rolling(window)
+    features = {f"{name}_roll_mean": windows[name].mean() for name in columns}
+    for q in quantiles:
+        features.update({f"{name}_roll_p{int(q*100)}": windows[name].quantile(q) for name in columns})
+    return pd.DataFrame(features)
+
+def rates(frame:pd.DataFrame, counters:List[str]=COUNTERS)->pd.DataFrame:
+    # per-second increase of cumulative counters per host; counter resets give NaN
+    counters = [name for name in counters if name in frame.columns]
+    ordered = frame[["host_name", "timestamp", *counters]].dropna(subset=counters, how="all").sort_values(["host_name", "timestamp"], kind="stable")
+    seconds = ordered.groupby("host_name")["timestamp"].diff().dt.total_seconds()
+    result = ordered[["host_name", "timestamp"]].copy()
+    for name in counters:
+        delta = ordered.groupby("host_name")[name].diff().astype("float64")
+        rate = delta / seconds.where(seconds > 0)
+        result[f"{name}_per_s"] = rate.where(delta >= 0)
+    return result
+
+def features(frame:pd.DataFrame, freqs:Sequence[str]=("10s", "1min", "5min"), window:str="15min", quantiles:Sequence[float]=(0.5, 0.95))->Dict[str, pd.DataFrame]:
+    # one table per frequency: bucket mean/max/count, rolling stats, and counter rates averaged per bucket
+    counter_rates = rates(frame)
+    result = {}
+    for freq in freqs:
+        resampled = resample(frame, freq)
+        table = resampled.join(rolling(resampled, window, quantiles=quantiles))
+        if len(counter_rates):
+            bucket = counter_rates["timestamp"].dt.floor(freq).rename("bucket")
+            rate_columns = [name for name in counter_rates.columns if name.endswith("_per_s")]
+            table = table.join(counter_rates.groupby([counter_rates["host_name"], bucket])[rate_columns].mean())
+        result[freq] = table
+    return result
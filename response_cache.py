@@ -0,0 +1,111 @@
+# Content-addressed on-disk cache of _search responses for ExtractMetricBeatLogs.
+# Entries are keyed by the index URL and a hash of the canonical query body and
+# stored gzip-compressed as <cache_dir>/<key[:2]>/<key>.json.gz. Responses for
+# windows that are still open (ending less than `settle` seconds ago, so late
+# documents may still arrive) expire after `ttl`; closed windows are kept until
+# size-based LRU eviction removes them.
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+class CacheMiss(KeyError):
+    pass
+
+def canonical_body(body:Dict[str, Any])->str:
+    # point-in-time ids change on every run, so they are not part of the key
+    body = {key: value for key, value in (body or {}).items() if key != "pit"}
+    return json.dumps(body, sort_keys=True, separators=(",", ":"))
+
+class ResponseCache:
+    def __init__(self, cache_dir:str="./logs/.cache", max_bytes:int=2*1024**3, ttl:float=300, settle:float=300, offline:bool=False, compresslevel:int=6):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.settle = settle
+        self.offline = offline # replay only: a miss raises CacheMiss instead of hitting the cluster
+        self.compresslevel = compresslevel
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: Dict[str, list] = {} # path -> [size, last_used]
+        self._size = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        for root, _, files in os.walk(cache_dir):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    self._entries[path] = [stat.st_size, stat.st_mtime]
+                    self._size += stat.st_size
+
+    def is_open(self, window_end:datetime)->bool:
+        return window_end > datetime.utcnow() - timedelta(seconds=self.settle)
+
+    def key(self, url:str, body:Dict[str, Any])->str:
+        return hashlib.sha256(f"{url}\n{canonical_body(body)}".encode()).hexdigest()
+
+    def path(self, key:str)->str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def get(self, url:str, body:Dict[str, Any])->Optional[Dict[str, Any]]:
+        path = self.path(self.key(url, body))
+        try:
+            with gzip.open(path, "rb") as f:
+                header = json.loads(f.readline())
+                content = f.read()
+        except (FileNotFoundError, OSError, ValueError):
+            self.misses += 1
+            return None
+        if header.get("expires") is not None and header["expires"] < time.time() and not self.offline:
+            self._remove(path)
+            self.misses += 1
+            return None
+        now = time.time()
+        os.utime(path, (now, now))
+        with self._lock:
+            if path in self._entries:
+                self._entries[path][1] = now
+        self.hits += 1
+        return json.loads(content)
+
+    def put(self, url:str, body:Dict[str, Any], content:bytes, open_window:bool=False):
+        path = self.path(self.key(url, body))
+        header = {"url": url, "expires": time.time() + self.ttl if open_window else None, "stored": time.time()}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wb", compresslevel=self.compresslevel) as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            f.write(content)
+        os.replace(tmp, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            previous = self._entries.get(path)
+            self._size += size - (previous[0] if previous else 0)
+            self._entries[path] = [size, time.time()]
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _remove(self, path:str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry:
+                self._size -= entry[0]
+
+    def evict(self, target:float=0.9):
+        # least recently used first, down to `target` of max_bytes
+        with self._lock:
+            victims = sorted(self._entries.items(), key=lambda item: item[1][1])
+        for path, (size, _) in victims:
+            if self._size <= self.max_bytes * target:
+                break
+            self._remove(path)
@@ -0,0 +1,170 @@
+# Server-side metrics rollups: per host, per minute avg / max / percentiles of the
+# numeric METRICS_FIELDS, computed by Elasticsearch with a composite aggregation
+# (terms on host.name x date_histogram on @timestamp) and paged with after_key.
+# Buckets are read through a fields.py Schema, so the rollup rows go to the same
+# CSV / Parquet sinks as raw documents.
+
+import csv
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List
+
+from ETL_MetricBeat import ExtractMetricBeatLogs, RateLimiter, format_time, make_session, parse_time
+from fields import METRICS_FIELDS, Field, Schema, source_path
+from instrumentation import RunStats
+
+# latency is an Elasticsearch histogram field; aggregations read the whole histogram, not values[0]
+AGG_PATHS = {"latency": "transaction.duration.histogram"}
+
+ROLLUP_METRICS = [field for field in METRICS_FIELDS if field.dtype in ("float64", "int64") and field.name != "number_of_requests"]
+
+# only bucket keys, aggregation results and the failed shard count (partial rollups are retried) come back
+ROLLUP_FILTER_PATH = "aggregations.rollup.after_key,aggregations.rollup.buckets,_shards.failed"
+
+def ms_to_time(value:int)->str:
+    return format_time(datetime(1970, 1, 1) + timedelta(milliseconds=value))
+
+class MetricsRollup:
+    def __init__(
+        self,
+        metrics:List[Field]=ROLLUP_METRICS,
+        interval:str="1m",
+        percents:Iterable[float]=(50, 95, 99),
+        host_path:str="host.name",
+        page_size:int=1000 # buckets per request
+    ):
+        self.metrics = list(metrics)
+        self.interval = interval
+        self.percents = list(percents)
+        self.host_path = host_path
+        self.page_size = page_size
+        fields = [
+            Field("timestamp", "key.minute", convert=ms_to_time, column="Timestamp", dtype="timestamp"),
+            Field("host_name", "key.host", "N/A", column="Host"),
+            Field("number_of_requests", "doc_count", 0, column="Number of Requests", dtype="int64"),
+        ]
+        for field in self.metrics:
+            column = field.column or field.name
+            fields.append(Field(f"{field.name}_avg", f"{field.name}_avg.value", column=f"{column} avg", dtype="float64"))
+            fields.append(Field(f"{field.name}_max", f"{field.name}_max.value", column=f"{column} max", dtype="float64"))
+            for i, percent in enumerate(self.percents):
+                name = f"{field.name}_p{percent:g}"
+                fields.append(Field(name, f"{field.name}_pct.values[{i}].value", column=f"{column} p{percent:g}", dtype="float64"))
+        self.schema = Schema("metrics_rollup", fields)
+
+    def composite(self)->Dict[str, Any]:
+        # minute first so pages come back in time order
+        return {
+            "size": self.page_size,
+            "sources": [
+                {"minute": {"date_histogram": {"field": "@timestamp", "fixed_interval": self.interval}}},
+                {"host": {"terms": {"field": self.host_path}}},
+            ]
+        }
+
+    def aggs(self)->Dict[str, Any]:
+        aggs = {}
+        for field in self.metrics:
+            path = AGG_PATHS.get(field.name) or source_path(field.path)
+            aggs[f"{field.name}_avg"] = {"avg": {"field": path}}
+            aggs[f"{field.name}_max"] = {"max": {"field": path}}
+            aggs[f"{field.name}_pct"] = {"percentiles": {"field": path, "percents": self.percents, "keyed": False}}
+        return aggs
+
+    def iter_rows(self, extract:ExtractMetricBeatLogs)->Iterator[List[Any]]:
+        for buckets in extract.iter_buckets("rollup", self.composite(), self.aggs()):
+            for bucket in buckets:
+                yield self.schema.values(bucket)
+
+class RollupLoad:
+    # writes <save_dir>/metrics-rollup.<start>-<end>.csv through a .partial file, like Load
+    def __init__(self, rows:Iterable[List[Any]], schema:Schema, log_info:Dict, save_dir:str):
+        self.rows = rows
+        self.schema = schema
+        self.log_info = log_info
+        self.save_dir = save_dir
+        self.rows_written = 0
+        self.run()
+
+    @property
+    def log_name(self):
+        return os.path.join(self.save_dir, "metrics-rollup.{}-{}.csv".format(self.log_info["start_time"], self.log_info["end_time"]))
+
+    def run(self):
+        os.makedirs(self.save_dir, exist_ok=True)
+        partial = self.log_name + ".partial"
+        with open(partial, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(self.schema.columns)
+            for row in self.rows:
+                writer.writerow(row)
+                self.rows_written += 1
+        os.replace(partial, self.log_name)
+
+def run_rollup(
+    url:str="https://116.101.122.180:5200/metrics-apm*/_search",
+    api_key:str=None,
+    start_time:str="2024-12-14T00:00:00.000Z",
+    end_time:str="2024-12-15T00:00:00.000Z",
+    cut_off:int=86400, # unit is seconds; one composite aggregation per cut_off window
+    output:str="csv", # "csv" or "parquet"
+    interval:str="1m",
+    percents:Iterable[float]=(50, 95, 99),
+    query:List[Dict[str, Any]]=(), # bool.must clauses ANDed with the time range
+    page_size:int=1000,
+    max_rps:float=None,
+    save_root:str="./logs",
+    stats_path:str=None,
+    prometheus_path:str=None
+)->int:
+    rollup = MetricsRollup(interval=interval, percents=percents, page_size=page_size)
+    session = make_session(pool_size=1)
+    rate_limiter = RateLimiter(max_rps)
+    stats = RunStats(stats_path, prometheus_path) if stats_path or prometheus_path else None
+    save_dir = f"{save_root}/{start_time}_{end_time}"
+    sink = None
+    if output == "parquet":
+        from columnar import ParquetSink
+        sink = ParquetSink(f"{save_dir}/parquet", name="rollup-{}-{}".format(start_time, end_time).replace(":", ""))
+    rows_written = 0
+    current = parse_time(start_time)
+    end_dt = parse_time(end_time)
+    try:
+        while current < end_dt:
+            window_end = min(current + timedelta(seconds=cut_off), end_dt)
+            info = {"start_time": format_time(current), "end_time": format_time(window_end)}
+            print("Rolling up metrics from {} to {}".format(info["start_time"], info["end_time"]))
+            extract = ExtractMetricBeatLogs(
+                url=url, api_key=api_key, **info, session=session, rate_limiter=rate_limiter, stats=stats,
+                query=list(query), filter_path=ROLLUP_FILTER_PATH
+            )
+            rows = rollup.iter_rows(extract)
+            if sink is not None:
+                for row in rows:
+                    sink.write(rollup.schema, row)
+                    rows_written += 1
+            else:
+                rows_written += RollupLoad(rows, rollup.schema, info, save_dir).rows_written
+            current = window_end
+    except BaseException:
+        # a failed run leaves no rollup part behind
+        if sink is not None:
+            sink.abort()
+        raise
+    if sink is not None:
+        sink.close()
+    if stats:
+        summary = stats.close()
+        print("Run stats: {} requests, latency p50 {} p99 {}".format(summary["requests"], summary["latency_s"]["p50"], summary["latency_s"]["p99"]))
+    print("Wrote {} rollup rows".format(rows_written))
+    return rows_written
+
+if __name__ == "__main__":
+
+    run_rollup(
+        url="https://116.101.122.180:5200/metrics-apm*/_search",
+        api_key='',
+        start_time="2024-12-23T00:00:00.000Z",
+        end_time="2024-12-24T00:00:00.000Z",
+        output="csv"
+    )
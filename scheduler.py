@@ -0,0 +1,113 @@
+# Runs run_etl for several indices at once, generalizing get_data.ipynb's
+# index_arr loop. Each IndexJob carries its own query clauses, window policy,
+# per-index worker budget and transform/sink routing. All jobs share one
+# connection pool, one rate limiter and a global cap on in-flight requests.
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, NamedTuple, Sequence
+
+from ETL_MetricBeat import METRICBEAT_QUERY, RateLimiter, make_session, run_etl
+from checkpoint import index_name
+from fields import METRICBEAT_SCHEMAS, FieldExtractor
+from kong import KongExtractor
+
+class IndexJob(NamedTuple):
+    index: str # index pattern, e.g. "metricbeat-*"
+    query: Sequence[Dict[str, Any]] = () # bool.must clauses ANDed with the time range
+    step: int = 1000 # unit is mili seconds
+    limit: int = 5000
+    cut_off: int = 900 # unit is seconds
+    mode: str = "window" # "window" or "search_after"
+    workers: int = 4 # per-index budget of concurrent requests
+    output: str = "text" # "text", "json" or "parquet"
+    extractor: FieldExtractor = None # defaults to dispatch on data_stream.type
+
+# the six sources of get_data.ipynb; kong access records go through KongExtractor, apm- has no schema yet so raw hits are kept
+NOTEBOOK_JOBS = [
+    IndexJob("kong-access-*", extractor=KongExtractor()),
+    IndexJob("metricbeat-*", query=METRICBEAT_QUERY, extractor=FieldExtractor(METRICBEAT_SCHEMAS, stream_path="agent.type")),
+    IndexJob("traces-apm*", mode="search_after"),
+    IndexJob("apm-*", output="json"),
+    IndexJob("logs-apm*"),
+    IndexJob("metrics-apm*"),
+]
+
+class Scheduler:
+    def __init__(
+        self,
+        base_url:str="https://116.101.122.180:5200",
+        api_key:str=None,
+        jobs:List[IndexJob]=NOTEBOOK_JOBS,
+        max_concurrency:int=16, # global budget of in-flight requests across all indices
+        max_rps:float=None,
+        save_root:str="./logs",
+        stats_dir:str=None, # per-index <index>.jsonl and <index>.prom
+        **run_kwargs # passed to every run_etl, e.g. checkpoint_dir or cache_dir
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.jobs = jobs
+        self.save_root = save_root
+        self.stats_dir = stats_dir
+        self.run_kwargs = run_kwargs
+        self.session = make_session(pool_size=max_concurrency)
+        self.rate_limiter = RateLimiter(max_rps)
+        self.budget = threading.BoundedSemaphore(max_concurrency)
+
+    def url(self, job:IndexJob)->str:
+        return f"{self.base_url}/{job.index}/_search"
+
+    def run_job(self, job:IndexJob, start_time:str, end_time:str):
+        url = self.url(job)
+        name = index_name(url)
+        kwargs = dict(self.run_kwargs)
+        if self.stats_dir:
+            kwargs.setdefault("stats_path", os.path.join(self.stats_dir, f"{name}.jsonl"))
+            kwargs.setdefault("prometheus_path", os.path.join(self.stats_dir, f"{name}.prom"))
+        run_etl(
+            url=url,
+            api_key=self.api_key,
+            start_time=start_time,
+            end_time=end_time,
+            step=job.step,
+            limit=job.limit,
+            cut_off=job.cut_off,
+            workers=job.workers,
+            mode=job.mode,
+            output=job.output,
+            query=list(job.query),
+            extractor=job.extractor,
+            save_root=os.path.join(self.save_root, name),
+            session=self.session,
+            rate_limiter=self.rate_limiter,
+            budget=self.budget,
+            **kwargs
+        )
+
+    def run(self, start_time:str, end_time:str)->List[str]:
+        # returns the indices whose job failed; the others completed
+        failed = []
+        with ThreadPoolExecutor(max_workers=len(self.jobs)) as executor:
+            futures = {executor.submit(self.run_job, job, start_time, end_time): job for job in self.jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    future.result()
+                    print("Finished {} from {} to {}".format(job.index, start_time, end_time))
+                except Exception as e:
+                    print(f"An error occurred: {job.index} {type(e).__name__} - {e}")
+                    failed.append(job.index)
+        return failed
+
+if __name__ == "__main__":
+
+    scheduler = Scheduler(
+        base_url="https://116.101.122.180:5200",
+        api_key='',
+        max_concurrency=16,
+        max_rps=200,
+        checkpoint_dir="./logs/.checkpoints"
+    )
+    scheduler.run("2025-01-02T00:00:00.000Z", "2025-01-03T00:00:00.000Z")
@@ -0,0 +1,197 @@
+# Compressed, rotating, atomically published line files with a time-range index.
+# Lines are buffered into blocks (~block_bytes uncompressed); each block is
+# compressed on its own as one gzip member or zstd frame and appended to the
+# current part, so a part is still an ordinary .gz/.zst file. Parts rotate by
+# uncompressed size or line count and are written as <part>.partial, then renamed.
+# The sidecar <base>.index.json (written last, also by rename) lists every part
+# with its line count, earliest/latest timestamps and each block's byte offset, so
+# read_range() only decompresses the blocks that overlap the asked-for time range.
+
+import glob
+import gzip
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from checkpoint import atomic_write
+
+try:
+    import zstandard
+except ImportError: # optional dependency, only needed for compression="zstd"
+    zstandard = None
+
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst", None: ""}
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ImportError("zstd output needs zstandard: pip install zstandard")
+
+def line_timestamp(line:str)->Optional[str]:
+    # "[2024-12-23T00:00:00.000Z] | ..." from Transform, or a raw hit's @timestamp
+    if line.startswith("["):
+        end = line.find("]")
+        return line[1:end] if end > 0 else None
+    start = line.find('"@timestamp": "')
+    if start >= 0:
+        start += len('"@timestamp": "')
+        return line[start:line.find('"', start)]
+    return None
+
+def compress(data:bytes, compression:str, level:int)->bytes:
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if compression == "zstd":
+        _require_zstandard()
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return data
+
+def decompress(data:bytes, compression:str)->bytes:
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        _require_zstandard()
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+class RotatingSink:
+    def __init__(
+        self,
+        base_name:str, # parts are <base_name>.000<ext>, <base_name>.001<ext>, ...
+        compression:str="gzip", # "gzip", "zstd" or None
+        level:int=None, # default 6 for gzip, 3 for zstd
+        rotate_bytes:int=None, # uncompressed bytes per part
+        rotate_lines:int=None, # lines per part
+        block_bytes:int=1<<20, # uncompressed bytes per compressed block (and index entry)
+        timestamp:Callable[[str], Optional[str]]=line_timestamp
+    ):
+        if compression not in EXTENSIONS:
+            raise ValueError(f"unknown compression {compression!r}")
+        if compression == "zstd":
+            _require_zstandard()
+        self.base_name = base_name
+        self.compression = compression
+        self.level = level if level is not None else (3 if compression == "zstd" else 6)
+        self.rotate_bytes = rotate_bytes
+        self.rotate_lines = rotate_lines
+        self.block_bytes = block_bytes
+        self.timestamp = timestamp
+        self.parts: List[Dict[str, Any]] = []
+        self.lines = 0
+        self.file = None
+        self._block: List[bytes] = []
+        self._block_size = 0
+        self._block_first = self._block_last = None
+
+    @property
+    def index_name(self)->str:
+        return self.base_name + ".index.json"
+
+    def part_name(self, number:int)->str:
+        return "{}.{:03d}{}".format(self.base_name, number, EXTENSIONS[self.compression])
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.base_name) or ".", exist_ok=True)
+        # leftovers of an attempt that never published its index
+        for stale in glob.glob(glob.escape(self.base_name) + ".[0-9][0-9][0-9]*"):
+            os.remove(stale)
+        self._open_part()
+
+    def _open_part(self):
+        name = self.part_name(len(self.parts))
+        self.parts.append({"file": os.path.basename(name), "lines": 0, "bytes": 0, "raw_bytes": 0, "first": None, "last": None, "blocks": []})
+        self.file = open(name + ".partial", "wb")
+
+    def write(self, lines):
+        for line in lines:
+            data = line.encode()
+            self._block.append(data)
+            self._block_size += len(data)
+            stamp = self.timestamp(line)
+            if stamp:
+                # earliest / latest, so out-of-order lines still fall inside the range
+                if self._block_first is None or stamp < self._block_first:
+                    self._block_first = stamp
+                if self._block_last is None or stamp > self._block_last:
+                    self._block_last = stamp
+            self.lines += 1
+            part = self.parts[-1]
+            part_lines = part["lines"] + len(self._block)
+            part_bytes = part["raw_bytes"] + self._block_size
+            if (self.rotate_lines and part_lines >= self.rotate_lines) or (self.rotate_bytes and part_bytes >= self.rotate_bytes):
+                self._flush_block()
+                self._publish_part()
+                self._open_part()
+            elif self._block_size >= self.block_bytes:
+                self._flush_block()
+
+    def _flush_block(self):
+        if not self._block:
+            return
+        data = compress(b"".join(self._block), self.compression, self.level)
+        part = self.parts[-1]
+        part["blocks"].append({"offset": part["bytes"], "lines": len(self._block), "first": self._block_first, "last": self._block_last})
+        self.file.write(data)
+        part["bytes"] += len(data)
+        part["raw_bytes"] += self._block_size
+        part["lines"] += len(self._block)
+        if self._block_first and (part["first"] is None or self._block_first < part["first"]):
+            part["first"] = self._block_first
+        if self._block_last and (part["last"] is None or self._block_last > part["last"]):
+            part["last"] = self._block_last
+        self._block, self._block_size = [], 0
+        self._block_first = self._block_last = None
+
+    def _publish_part(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.file = None
+        name = self.part_name(len(self.parts) - 1)
+        os.replace(name + ".partial", name)
+
+    def sync(self)->int:
+        # compressed bytes published or flushed so far
+        self._flush_block()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return sum(part["bytes"] for part in self.parts)
+
+    def commit(self)->int:
+        self._flush_block()
+        self._publish_part()
+        if len(self.parts) > 1 and not self.parts[-1]["lines"]:
+            # rotation landed on the last line
+            os.remove(self.part_name(len(self.parts) - 1))
+            self.parts.pop()
+        atomic_write(self.index_name, json.dumps({
+            "compression": self.compression, "lines": self.lines, "parts": self.parts,
+        }, indent=1))
+        return sum(part["bytes"] for part in self.parts)
+
+def read_index(index_name:str)->Dict[str, Any]:
+    with open(index_name, "r") as f:
+        return json.load(f)
+
+def read_range(index_name:str, start_time:str=None, end_time:str=None, timestamp:Callable[[str], Optional[str]]=line_timestamp)->Iterator[str]:
+    # lines with start_time <= timestamp <= end_time, decompressing only overlapping blocks
+    index = read_index(index_name)
+    directory = os.path.dirname(index_name)
+    def overlaps(entry):
+        if entry["first"] is None:
+            return True
+        return (end_time is None or entry["first"] <= end_time) and (start_time is None or entry["last"] >= start_time)
+    for part in index["parts"]:
+        if not overlaps(part):
+            continue
+        blocks = part["blocks"]
+        with open(os.path.join(directory, part["file"]), "rb") as f:
+            for i, block in enumerate(blocks):
+                if not overlaps(block):
+                    continue
+                end = blocks[i+1]["offset"] if i + 1 < len(blocks) else part["bytes"]
+                f.seek(block["offset"])
+                data = decompress(f.read(end - block["offset"]), index["compression"])
+                for line in data.decode().splitlines(keepends=True):
+                    stamp = timestamp(line)
+                    if stamp is None or ((start_time is None or stamp >= start_time) and (end_time is None or stamp <= end_time)):
+                        yield line
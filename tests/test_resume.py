@@ -0,0 +1,61 @@
+# Crash-then-resume regression tests for run_etl against the fake cluster in
+# benchmarks/: every hit must land in the output exactly once, even when the
+# resumed run plans its windows with a different end (follow mode).
+#   python -m pytest -q tests
+
+import glob
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import ETL_MetricBeat
+from checkpoint import Checkpoint
+from ETL_MetricBeat import format_time, parse_time, run_etl
+from fake_es import FakeElasticsearch
+from synthetic import generate
+
+def crash_on(monkeypatch, write_number:int, start_time:str):
+    # checkpoints on every page, and a KeyboardInterrupt on the Nth write of the window starting at start_time
+    monkeypatch.setattr(Checkpoint, "due", property(lambda self: True))
+    write = ETL_MetricBeat.Load.write
+    calls = {"n": 0}
+    def crashing(self, logs):
+        if self.log_info["start_time"] == start_time:
+            calls["n"] += 1
+            if calls["n"] == write_number:
+                raise KeyboardInterrupt
+        write(self, logs)
+    monkeypatch.setattr(ETL_MetricBeat.Load, "write", crashing)
+    return write
+
+@pytest.mark.parametrize("dedup", [True, False])
+def test_follow_resumes_partial_window_with_moved_end(tmp_path, monkeypatch, dedup):
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    start = now - timedelta(seconds=120)
+    hits = list(generate(2400, streams=["metrics"], start_time=format_time(start), docs_per_second=20))
+    settings = dict(
+        api_key="", start_time=format_time(start), follow=True, cut_off=40, step=5000, limit=170,
+        mode="search_after", query=[], save_root=str(tmp_path), checkpoint_dir=str(tmp_path / "ck"), dedup=dedup
+    )
+    with FakeElasticsearch(hits) as es:
+        # first run: windows [start, +40s) and [+40s, now-60s), crashing inside the second
+        write = crash_on(monkeypatch, 2, format_time(start + timedelta(seconds=40)))
+        with pytest.raises(KeyboardInterrupt):
+            run_etl(url=es.url("metrics-apm*"), follow_lag=60, **settings)
+        monkeypatch.setattr(ETL_MetricBeat.Load, "write", write)
+        # second run ends later, so the crashed window would otherwise be planned as [+40s, +80s)
+        run_etl(url=es.url("metrics-apm*"), follow_lag=30, **settings)
+
+    high_water = parse_time(Checkpoint(str(tmp_path / "ck" / "metrics-apm.json")).high_water)
+    expected = sum(1 for hit in hits if parse_time(hit["_source"]["@timestamp"]) < high_water)
+    files = glob.glob(str(tmp_path / "*" / "metricbeat-logs.*"))
+    lines = [line for name in files for line in open(name)]
+    assert [name for name in files if name.endswith(".partial")] == []
+    assert len(lines) == expected
+    assert len(set(lines)) == expected
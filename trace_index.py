@@ -0,0 +1,270 @@
+# One-pass index of APM transactions and spans for rebuilding request trees.
+# Every traces hit becomes a Node keyed by its transaction.id or span.id, grouped by
+# trace.id and linked through parent.id, so a whole trace, its tree and its critical
+# path come back without joining traces.csv against itself. Transaction durations
+# also go into one mergeable Histogram per transaction name. The index is saved as
+# gzip JSON lines: save() appends only what changed as a numbered segment file next
+# to the base file, and close() folds the segments back into it. It can be reopened
+# and extended by later runs; hits seen before (same id) replace their node without
+# being counted twice.
+
+import gzip
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from fields import Field, Schema
+from histogram import Histogram
+
+TRACE_INDEX_SCHEMA = Schema("trace_index", [
+    Field("trace_id", "trace.id"),
+    Field("event", "processor.event"),
+    Field("transaction_id", "transaction.id"),
+    Field("span_id", "span.id"),
+    Field("parent_id", "parent.id"),
+    Field("transaction_name", "transaction.name"),
+    Field("span_name", "span.name"),
+    Field("transaction_duration", "transaction.duration.us", dtype="int64"),
+    Field("span_duration", "span.duration.us", dtype="int64"),
+    Field("start_us", "timestamp.us", 0, dtype="int64"),
+    Field("service", "service.name"),
+])
+
+class Node(NamedTuple):
+    id: str
+    parent_id: Optional[str]
+    kind: str # "transaction" or "span"
+    name: str
+    start_us: int
+    duration_us: int
+    service: Optional[str]
+    transaction_id: Optional[str]
+
+    @property
+    def end_us(self)->int:
+        return self.start_us + self.duration_us
+
+class TraceIndex:
+    def __init__(self, path:str=None, relative_accuracy:float=0.01, evict:bool=False):
+        self.path = path
+        self.relative_accuracy = relative_accuracy
+        # writer side (run_etl): each save() drops the nodes of traces idle since the save
+        # before it; owner and histograms stay, so counting is unchanged. Reopen to query.
+        self.evict = evict
+        self.traces: Dict[str, Dict[str, Node]] = {}
+        self.owner: Dict[str, str] = {} # node id -> trace id
+        self.histograms: Dict[str, Histogram] = {}
+        self.segments = 0 # number of the last segment file written or read
+        self._folded = 0 # segments already folded into the base file
+        self._dirty: Dict[str, Dict[str, Node]] = {} # nodes added since the last save, per trace
+        self._changed = set() # histograms changed since the last save
+        self._recent = set() # traces written by the last save
+        if path and (os.path.exists(path) or self.segment_paths(path)):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.owner)
+
+    @property
+    def trace_count(self)->int:
+        # also counts traces evicted from memory
+        return len(set(self.owner.values()))
+
+    def _put(self, trace_id:str, node:Node):
+        # a transaction is counted once, the first time its id is seen
+        if node.kind == "transaction" and node.id not in self.owner:
+            self.latency(node.name).add(node.duration_us)
+            self._changed.add(node.name)
+        self.traces.setdefault(trace_id, {})[node.id] = node
+        self.owner[node.id] = trace_id
+        self._dirty.setdefault(trace_id, {})[node.id] = node
+
+    def add(self, source:Dict[str, Any])->bool:
+        trace_id, event, transaction_id, span_id, parent_id, transaction_name, span_name, transaction_duration, span_duration, start_us, service = TRACE_INDEX_SCHEMA.values(source)
+        if not trace_id:
+            return False
+        if event == "span" or (span_id and event != "transaction"):
+            node = Node(span_id, parent_id, "span", span_name or "", start_us, span_duration or 0, service, transaction_id)
+        elif transaction_id:
+            node = Node(transaction_id, parent_id, "transaction", transaction_name or "", start_us, transaction_duration or 0, service, transaction_id)
+        else:
+            return False
+        if not node.id:
+            return False
+        self._put(trace_id, node)
+        return True
+
+    def extend(self, hits:Iterable[Dict[str, Any]])->int:
+        return sum(self.add(hit.get("_source", {})) for hit in hits)
+
+    def tap(self, hits:Iterable[Dict[str, Any]])->Iterator[Dict[str, Any]]:
+        # index hits on their way to another consumer
+        for hit in hits:
+            self.add(hit.get("_source", {}))
+            yield hit
+
+    def latency(self, transaction_name:str)->Histogram:
+        histogram = self.histograms.get(transaction_name)
+        if histogram is None:
+            histogram = self.histograms[transaction_name] = Histogram(self.relative_accuracy)
+        return histogram
+
+    def trace_id(self, key:str)->Optional[str]:
+        # accepts a trace.id or any transaction.id / span.id in it
+        return key if key in self.traces else self.owner.get(key)
+
+    def trace(self, key:str)->Dict[str, Node]:
+        return self.traces.get(self.trace_id(key), {})
+
+    def children(self, key:str)->Dict[Optional[str], List[Node]]:
+        nodes = self.trace(key)
+        children = {}
+        for node in nodes.values():
+            # a parent outside the index (not fetched yet, other index) makes the node a root
+            parent = node.parent_id if node.parent_id in nodes else None
+            children.setdefault(parent, []).append(node)
+        for siblings in children.values():
+            siblings.sort(key=lambda node: (node.start_us, node.id))
+        return children
+
+    def roots(self, key:str)->List[Node]:
+        return self.children(key).get(None, [])
+
+    def tree(self, key:str)->List[Dict[str, Any]]:
+        children = self.children(key)
+        def build(node, seen):
+            seen.add(node.id)
+            return {**node._asdict(), "children": [build(child, seen) for child in children.get(node.id, []) if child.id not in seen]}
+        seen = set()
+        return [build(root, seen) for root in children.get(None, [])]
+
+    def critical_path(self, key:str)->Dict[str, Any]:
+        # walk back from the root's end: at each point the child that finishes last is on the
+        # path, time not covered by any child is the node's own; segments sum to the root duration
+        children = self.children(key)
+        roots = children.get(None, [])
+        if not roots:
+            return {"trace_id": self.trace_id(key), "duration_us": 0, "path": []}
+        root = max(roots, key=lambda node: (node.duration_us, -node.start_us))
+        segments = []
+        def walk(node, end, seen):
+            seen.add(node.id)
+            cursor = end
+            for child in sorted(children.get(node.id, []), key=lambda child: child.end_us, reverse=True):
+                if child.id in seen or child.start_us >= cursor:
+                    continue
+                child_end = min(child.end_us, cursor)
+                if child_end < cursor:
+                    segments.append((node, cursor - child_end))
+                walk(child, child_end, seen)
+                cursor = max(child.start_us, node.start_us)
+                if cursor <= node.start_us:
+                    break
+            if cursor > node.start_us:
+                segments.append((node, cursor - node.start_us))
+        walk(root, root.end_us, set())
+        path = {}
+        for node, self_us in reversed(segments):
+            entry = path.setdefault(node.id, {"id": node.id, "name": node.name, "kind": node.kind, "service": node.service, "self_us": 0})
+            entry["self_us"] += self_us
+        return {"trace_id": self.trace_id(key), "root": root.id, "duration_us": root.duration_us, "path": list(path.values())}
+
+    def merge(self, other:"TraceIndex")->"TraceIndex":
+        # counted like add(): only transactions this index has not seen yet
+        for trace_id, nodes in other.traces.items():
+            for node in nodes.values():
+                self._put(trace_id, node)
+        return self
+
+    @staticmethod
+    def segment_paths(path:str)->List[Tuple[int, str]]:
+        # <path>.000001, <path>.000002, ... in write order
+        directory, name = os.path.split(path)
+        pattern = re.compile(re.escape(name) + r"\.(\d{6})$")
+        matches = [pattern.match(entry) for entry in os.listdir(directory or ".")] if os.path.isdir(directory or ".") else []
+        return sorted((int(match.group(1)), os.path.join(directory, match.group(0))) for match in matches if match)
+
+    @staticmethod
+    def _write(path:str, header:Dict[str, Any], traces:Iterable[Tuple[str, Dict[str, Node]]]):
+        # header line, then one line per trace
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(json.dumps(header) + "\n")
+            for trace_id, nodes in traces:
+                f.write(json.dumps([trace_id, [list(node) for node in nodes.values()]]) + "\n")
+        os.replace(tmp, path)
+
+    def save(self):
+        # the nodes and histograms changed since the last save, as the next segment file:
+        # a checkpoint costs what it added, not the whole index
+        if not self.path or not (self._dirty or self._changed):
+            return
+        self.segments += 1
+        self._write(f"{self.path}.{self.segments:06d}", {
+            "histograms": {name: self.histograms[name].to_dict() for name in self._changed},
+        }, self._dirty.items())
+        saved = set(self._dirty)
+        self._dirty, self._changed = {}, set()
+        if self.evict:
+            for trace_id in [trace_id for trace_id in self.traces if trace_id not in saved and trace_id not in self._recent]:
+                del self.traces[trace_id]
+        self._recent = saved
+
+    def close(self):
+        # saves the rest, then rewrites base + segments as one base file; with evict the
+        # nodes no longer in memory are read back from disk for it
+        self.save()
+        if not self.path or self.segments == self._folded:
+            return
+        full = TraceIndex(self.path, self.relative_accuracy) if self.evict else self
+        # the base records the segments it holds, so a crash before they are removed can't replay them
+        self._write(self.path, {
+            "relative_accuracy": full.relative_accuracy,
+            "histograms": {name: histogram.to_dict() for name, histogram in full.histograms.items()},
+            "segments": self.segments,
+        }, full.traces.items())
+        for number, segment in self.segment_paths(self.path):
+            if number <= self.segments:
+                os.remove(segment)
+        self._folded = self.segments
+
+    def _read(self, path:str)->Dict[str, Any]:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            for name, data in header["histograms"].items():
+                self.histograms[name] = Histogram.from_dict(data)
+            for line in f:
+                trace_id, nodes = json.loads(line)
+                mine = self.traces.setdefault(trace_id, {})
+                for node in nodes:
+                    mine[node[0]] = Node(*node)
+                    self.owner[node[0]] = trace_id
+        return header
+
+    def load(self, path:str):
+        if os.path.exists(path):
+            header = self._read(path)
+            self.relative_accuracy = header["relative_accuracy"]
+            self._folded = self.segments = header.get("segments", 0)
+        for number, segment in self.segment_paths(path):
+            if number > self._folded:
+                # later segments hold newer states of the histograms they name
+                self._read(segment)
+                self.segments = number
+        if self.evict:
+            self.traces = {}
+
+if __name__ == "__main__":
+    import sys
+
+    from json_stream import iter_hits
+
+    # python trace_index.py <index.jsonl.gz> <dump.json> [...]: extend the index with each dump
+    index = TraceIndex(sys.argv[1])
+    for dump in sys.argv[2:]:
+        print("Indexed {} spans/transactions from {}".format(index.extend(iter_hits(dump)), dump))
+    index.close()
+    for name, histogram in sorted(index.histograms.items(), key=lambda item: -item[1].count)[:10]:
+        print(name, histogram.summary())